@@ -25,6 +25,97 @@ class Config:
     # ChromaDB
     CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "./data/chroma_db")
     
+    # Détection des changements dans DOCUMENTS_DIRECTORY (secondes entre deux scans)
+    RAG_CHANGE_CHECK_INTERVAL = float(os.getenv("RAG_CHANGE_CHECK_INTERVAL", "30"))
+    
+    # Chargement des documents dans des process séparés (au plus N en parallèle, 1 = un à la fois) et timeout par fichier
+    RAG_LOADER_WORKERS = int(os.getenv("RAG_LOADER_WORKERS", str(os.cpu_count() or 1)))
+    RAG_LOADER_TIMEOUT = float(os.getenv("RAG_LOADER_TIMEOUT", "300"))
+    
+    # Backend d'embeddings : "openai", "hashing" (local, déterministe, sans réseau)
+    # ou "local" (modèle CPU sentence-transformers, dépendance optionnelle)
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+    EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1024"))
+    LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    
+    # Cache persistant des embeddings (SQLite, clé = modèle + hash du texte)
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./data/embedding_cache.sqlite")
+    
+    # Embeddings en parallèle : taille des batchs (tokens estimés / nombre de textes) et requêtes simultanées
+    EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "500"))
+    EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+    
+    # Cache mémoire (LRU + TTL en secondes) des embeddings de requêtes et des résultats de recherche
+    RAG_QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "512"))
+    RAG_QUERY_CACHE_TTL = float(os.getenv("RAG_QUERY_CACHE_TTL", "3600"))
+    
+    # Recherche hybride BM25 + vectorielle : poids du score dense dans la fusion,
+    # et couverture des termes de la requête à partir de laquelle on répond localement (sans embedding)
+    RAG_HYBRID_ENABLED = os.getenv("RAG_HYBRID_ENABLED", "true").lower() == "true"
+    RAG_HYBRID_ALPHA = float(os.getenv("RAG_HYBRID_ALPHA", "0.5"))
+    RAG_LEXICAL_SHORTCUT = float(os.getenv("RAG_LEXICAL_SHORTCUT", "0.9"))
+    # Confiance d'une section INTERNE acceptée sur ce seul match lexical (non vérifié par les
+    # embeddings) : sous le seuil de 0.7, la recommandation d'expert est conservée
+    RAG_LEXICAL_CONFIDENCE = float(os.getenv("RAG_LEXICAL_CONFIDENCE", "0.65"))
+    
+    # Nombre de chunks écrits dans ChromaDB par appel
+    CHROMA_ADD_BATCH_SIZE = int(os.getenv("CHROMA_ADD_BATCH_SIZE", "5000"))
+    
+    # Workflow : "parallel" (sections 1.x/2.x en parallèle) ou "sequential"
+    WORKFLOW_MODE = os.getenv("WORKFLOW_MODE", "parallel").lower()
+    WORKFLOW_MAX_CONCURRENCY = int(os.getenv("WORKFLOW_MAX_CONCURRENCY", "4"))
+    
+    # Pool de threads borné pour les appels bloquants (ChromaDB, embeddings) depuis les nodes async
+    BLOCKING_POOL_WORKERS = int(os.getenv("BLOCKING_POOL_WORKERS", "8"))
+    
+    # Cascade de recherche : "speculative" (INTERNE et WEB lancés en parallèle, WEB annulé si
+    # INTERNE est accepté) ou "sequential" ; estimation anticipée quand INTERNE est rejeté
+    CASCADE_MODE = os.getenv("CASCADE_MODE", "speculative").lower()
+    CASCADE_EARLY_ESTIMATION = os.getenv("CASCADE_EARLY_ESTIMATION", "false").lower() == "true"
+    
+    # Clients LLM partagés : pool de connexions keep-alive, timeouts (secondes) et retries
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    
+    # Scheduler des appels OpenAI (chat et embeddings) : limites du compte par minute,
+    # tokens de complétion estimés quand max_tokens n'est pas fixé
+    LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "true").lower() == "true"
+    OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+    OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+    LLM_COMPLETION_TOKENS_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKENS_ESTIMATE", "1000"))
+    
+    # Checkpoints LangGraph persistants (SQLite, un thread par conversation_id) pour "deepen",
+    # et budget de recherche élargi lors de l'approfondissement d'une section
+    CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+    CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "./data/checkpoints.sqlite")
+    DEEPEN_RETRIEVAL_K = int(os.getenv("DEEPEN_RETRIEVAL_K", "8"))
+    
+    # Cache disque des rapports complets (SQLite, TTL en secondes, invalidé à chaque ré-indexation)
+    REPORT_CACHE_ENABLED = os.getenv("REPORT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "./data/result_cache.sqlite")
+    REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "86400"))
+    
+    # Cache des sections partagé entre rapports (même marché/géographie, même index et mêmes données sources)
+    SECTION_CACHE_ENABLED = os.getenv("SECTION_CACHE_ENABLED", "true").lower() == "true"
+    SECTION_CACHE_TTL = float(os.getenv("SECTION_CACHE_TTL", "86400"))
+    
+    # SSE : relayer le contenu des sections token par token (événements section_delta)
+    SSE_STREAM_TOKENS = os.getenv("SSE_STREAM_TOKENS", "true").lower() == "true"
+    
+    # File de jobs de rapports : workflows exécutés en parallèle, jobs en attente max,
+    # conservation des jobs terminés (secondes) pour les endpoints statut/résultat
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "20"))
+    JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+    
+    # Single-flight : une requête identique à un job en attente ou en cours s'y rattache
+    REQUEST_COALESCING_ENABLED = os.getenv("REQUEST_COALESCING_ENABLED", "true").lower() == "true"
+    
     # FastAPI
     API_HOST = os.getenv("API_HOST", "0.0.0.0")
     API_PORT = int(os.getenv("API_PORT", "8000"))
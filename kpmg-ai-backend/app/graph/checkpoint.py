@@ -0,0 +1,63 @@
+"""Persistent LangGraph checkpointer (SQLite), one thread per conversation_id"""
+from typing import Optional
+import os
+from app.config import Config
+
+
+async def open_checkpointer():
+    """
+    Open the SQLite checkpointer at CHECKPOINT_DB_PATH
+    
+    Returns:
+        An AsyncSqliteSaver, or None if disabled or if langgraph-checkpoint-sqlite is missing
+    """
+    if not Config.CHECKPOINT_ENABLED:
+        return None
+    
+    # Dépendance : pip install langgraph-checkpoint-sqlite
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError:
+        print("⚠️  langgraph-checkpoint-sqlite not installed: conversations are not checkpointed, \"deepen\" regenerates the whole report")
+        return None
+    
+    os.makedirs(os.path.dirname(os.path.abspath(Config.CHECKPOINT_DB_PATH)), exist_ok=True)
+    conn = await aiosqlite.connect(Config.CHECKPOINT_DB_PATH)
+    checkpointer = AsyncSqliteSaver(conn)
+    await checkpointer.setup()
+    return checkpointer
+
+
+async def close_checkpointer(checkpointer):
+    """Close the checkpointer's SQLite connection"""
+    if checkpointer is not None:
+        await checkpointer.conn.close()
+
+
+def thread_config(conversation_id: str) -> dict:
+    """Run config selecting the checkpoint thread of a conversation"""
+    return {"configurable": {"thread_id": conversation_id}}
+
+
+async def load_conversation_state(graph, conversation_id: str) -> Optional[dict]:
+    """
+    Last checkpointed state of a conversation
+    
+    Returns:
+        The state values, or None without a checkpointer or stored state
+    """
+    if getattr(graph, "checkpointer", None) is None:
+        return None
+    snapshot = await graph.aget_state(thread_config(conversation_id))
+    return snapshot.values or None
+
+
+async def save_conversation_state(graph, conversation_id: str, values: dict):
+    """
+    Write a state into a conversation's checkpoint thread (e.g. report served from cache),
+    so that a later "deepen" can resume from it
+    """
+    if getattr(graph, "checkpointer", None) is None:
+        return
+    await graph.aupdate_state(thread_config(conversation_id), values, as_node="expert_recommendation")
@@ -1,6 +1,66 @@
 """State definition for LangGraph workflow"""
-from typing import TypedDict, List, Optional, Dict, Any
+from typing import TypedDict, List, Optional, Dict, Any, Annotated
 from langgraph.graph.message import AnyMessage
+import re
+
+
+def _section_sort_key(section: Dict[str, Any]) -> tuple:
+    """Ordre du plan à partir de la numérotation de l'ID ("1.2 Sizing" → (1, 2))"""
+    match = re.match(r"\s*(\d+(?:\.\d+)*)", section.get("id", ""))
+    if not match:
+        return (float("inf"),)
+    return tuple(int(part) for part in match.group(1).split("."))
+
+
+def in_plan_order(items: List[Dict[str, Any]], key: str = "id") -> List[Dict[str, Any]]:
+    """Éléments dans l'ordre du plan (numérotation de leur clé), calculé à la lecture"""
+    return sorted(items, key=lambda item: _section_sort_key({"id": item.get(key, "")}))
+
+
+class _KeyedList(list):
+    """Liste fusionnée par reducer, avec l'index clé → position de ses éléments"""
+    
+    def __init__(self, items: List[Dict[str, Any]], key: str):
+        super().__init__(items)
+        self.positions = {item.get(key, ""): i for i, item in enumerate(self)}
+    
+    def __reduce_ex__(self, protocol):
+        # Copies et sérialisation (checkpoint) : liste simple, l'index est reconstruit à la fusion suivante
+        return (list, (list(self),))
+
+
+def _merge_by_key(left: Optional[List[Dict[str, Any]]], right: Optional[List[Dict[str, Any]]], key: str) -> List[Dict[str, Any]]:
+    """
+    Fusion en place, linéaire en nombre d'éléments : un élément dont la clé existe déjà
+    remplace l'ancien (index clé → position), sinon il est ajouté à la fin. La liste garde
+    l'ordre d'arrivée ; l'ordre du plan est calculé une fois à la lecture (in_plan_order).
+    None réinitialise la liste (nouveau rapport sur une conversation déjà checkpointée).
+    """
+    if right is None:
+        return _KeyedList([], key)
+    merged = left if isinstance(left, _KeyedList) else _KeyedList(left or [], key)
+    for item in right:
+        item_key = item.get(key, "")
+        position = merged.positions.get(item_key)
+        if position is None:
+            merged.positions[item_key] = len(merged)
+            merged.append(item)
+        else:
+            merged[position] = item
+    return merged
+
+
+def merge_sections(left: List[Dict[str, Any]], right: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Reducer des sections : les nodes ne renvoient que les sections qu'ils produisent,
+    fusionnées par ID (la dernière version gagne)
+    """
+    return _merge_by_key(left, right, "id")
+
+
+def merge_recommendations(left: List[Dict[str, Any]], right: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reducer des recommandations d'expert : fusion par section_id"""
+    return _merge_by_key(left, right, "section_id")
 
 
 class AgentState(TypedDict):
@@ -18,20 +78,26 @@ class AgentState(TypedDict):
     # Workflow
     current_section: Optional[str]
     sections_to_process: List[str]
-    completed_sections: List[Dict[str, Any]]
     
     # Recherche cascade
     current_query: Optional[str]
+    retrieval_k: Optional[int]  # Nombre de chunks INTERNE (budget élargi pour "deepen")
+    deepening: Optional[bool]  # deepen_section a été exécuté (False si "deepen" est retombé sur l'orchestrateur)
+    prefetched_internal_results: Optional[Dict[str, Dict[str, Any]]]  # RetrievalResult pré-calculés par section (dict)
     internal_result: Optional[Dict[str, Any]]
     web_result: Optional[Dict[str, Any]]
     estimation_result: Optional[Dict[str, Any]]
     final_source: Optional[str]  # "INTERNE", "WEB", "ESTIMATION"
     source_history: List[Dict[str, Any]]
     confidence_score: Optional[float]
+    synthesis_context: Optional[str]  # Données des sections précédentes (sections de synthèse)
+    has_numeric_data: Optional[bool]
+    section_cache_key: Optional[str]  # Clé de la section dans le cache partagé entre rapports
+    cached_section: Optional[Dict[str, Any]]  # Section servie depuis ce cache (court-circuite la génération)
     
-    # Rapport final
-    report_sections: List[Dict[str, Any]]
-    expert_recommendations: List[Dict[str, Any]]
+    # Rapport final (une seule liste de sections, fusionnée par reducer)
+    report_sections: Annotated[List[Dict[str, Any]], merge_sections]
+    expert_recommendations: Annotated[List[Dict[str, Any]], merge_recommendations]
     
     # Messages
     messages: List[AnyMessage]
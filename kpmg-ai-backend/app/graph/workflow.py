@@ -1,13 +1,96 @@
 """LangGraph workflow for KPMG AI Agent"""
 from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
+from langgraph.constants import Send
 from langchain.prompts import ChatPromptTemplate
-from .state import AgentState
+from .state import AgentState, in_plan_order
 from app.config import Config
+from app.utils.llm import get_llm
+from app.utils.result_cache import cache_key, get_section_cache
+from app.utils.concurrency import run_blocking
+from app.utils.metrics import timed, NODE_DURATION, CASCADE_OUTCOMES
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
 import time
 
 
-def orchestrator_node(state: AgentState) -> AgentState:
+# Sections de synthèse : construites à partir des sections précédentes, sans recherche
+SYNTHESIS_SECTIONS = [
+    "3.1 Synthèse",
+    "3.2 Risques",
+    "3.3 Leviers",
+    "3.4 Prochaines"
+]
+
+
+# Tag des appels LLM qui rédigent le contenu d'une section (streaming token par token)
+SECTION_CONTENT_TAG = "section_content"
+
+
+def is_synthesis_section(section: str) -> bool:
+    """Indique si une section est une section de synthèse (partie 3)"""
+    return any(ss in section for ss in SYNTHESIS_SECTIONS)
+
+
+def build_section_query(section: str, market_name: str, geography: str) -> str:
+    """Requête de recherche associée à une section"""
+    return f"{section} pour le marché {market_name} en {geography}"
+
+
+def section_source_hash(state: AgentState, section: str) -> str:
+    """
+    Hash des données sources d'une section : chunks INTERNE pré-calculés pour une section
+    de recherche, contenu des sections précédentes pour une section de synthèse
+    """
+    if is_synthesis_section(section):
+        sources = [
+            [s.get("id", ""), s.get("content", "")]
+            for s in in_plan_order(state.get("report_sections") or []) if s.get("id") != section
+        ]
+    else:
+        prefetched = (state.get("prefetched_internal_results") or {}).get(section) or {}
+        sources = [chunk.get("content", "") for chunk in prefetched.get("chunks", [])]
+    return hashlib.sha256(json.dumps(sources).encode("utf-8")).hexdigest()
+
+
+def _section_cache_key(state: AgentState, section: str) -> str:
+    """Clé du cache des sections : (section, marché, géographie, données sources)"""
+    return cache_key(section, state.get("market_name"), state.get("geography"), section_source_hash(state, section))
+
+
+def _get_cached_section(key: str):
+    """Section en cache, pour la version courante de l'index RAG"""
+    from app.tools.rag_tool import get_index_version
+    return get_section_cache().get(key, get_index_version())
+
+
+def _store_cached_section(key: str, section_data: dict):
+    """Mettre en cache une section, pour la version courante de l'index RAG"""
+    from app.tools.rag_tool import get_index_version
+    get_section_cache().set(key, get_index_version(), section_data)
+
+
+async def _prefetch_internal_results(sections: list, market_name: str, geography: str) -> dict:
+    """
+    Recherche INTERNE groupée pour toutes les sections non-synthèse :
+    un seul appel d'embedding et une seule requête ChromaDB.
+    """
+    from app.tools.rag_tool import aretrieve_internal_knowledge_batch
+    
+    research_sections = [s for s in sections if not is_synthesis_section(s)]
+    queries = [build_section_query(s, market_name, geography) for s in research_sections]
+    try:
+        results = await aretrieve_internal_knowledge_batch(queries)
+    except Exception as e:
+        print(f"⚠️  Batch internal search failed, falling back to per-section search: {e}")
+        return {}
+    return {section: result.model_dump() for section, result in zip(research_sections, results)}
+
+
+@timed(NODE_DURATION, node="orchestrator")
+async def orchestrator_node(state: AgentState) -> AgentState:
     """
     Node orchestrateur : décompose la mission en sections et initie le workflow.
     """
@@ -30,26 +113,77 @@ def orchestrator_node(state: AgentState) -> AgentState:
     ]
     
     state["sections_to_process"] = sections
-    state["completed_sections"] = []
-    state["report_sections"] = []
+    # None réinitialise les listes fusionnées par reducer (conversation déjà checkpointée)
+    state["report_sections"] = None
+    state["expert_recommendations"] = None
+    state["retrieval_k"] = None
+    state["deepening"] = False
     state["total_sections"] = len(sections)
     state["current_section_index"] = 0
     state["progress_percentage"] = 0.0
     state["start_time"] = time.time()
     state["current_step"] = "orchestrator"
     state["step_details"] = {"message": "Initialisation du workflow..."}
+    state["prefetched_internal_results"] = await _prefetch_internal_results(
+        sections, state["market_name"], state["geography"]
+    )
+    
+    return state
+
+
+@timed(NODE_DURATION, node="deepen_section")
+def deepen_section_node(state: AgentState) -> AgentState:
+    """
+    Node d'approfondissement : reprend l'état checkpointé de la conversation et prépare
+    la recherche en cascade d'une seule section, avec un budget de recherche élargi.
+    """
+    sections = state.get("sections_to_process", [])
+    section = state["section_id"]
+    
+    state["current_section"] = section
+    state["current_section_index"] = sections.index(section) if section in sections else 0
+    state["current_query"] = build_section_query(section, state["market_name"], state["geography"])
+    state["retrieval_k"] = Config.DEEPEN_RETRIEVAL_K
+    state["deepening"] = True
+    state["prefetched_internal_results"] = {}  # Forcer une nouvelle recherche INTERNE avec k élargi
+    state["start_time"] = time.time()
+    state["current_step"] = "deepen_section"
+    state["progress_percentage"] = 0.0
+    state["step_details"] = {
+        "message": f"Approfondissement de la section {section}...",
+        "section": section
+    }
     
     return state
 
 
+def route_entry(state: AgentState) -> str:
+    """
+    Point d'entrée : "deepen" sur une section déjà générée (état restauré depuis le checkpoint
+    de la conversation) ne relance que cette section, sinon génération complète
+    """
+    if state.get("action") == "deepen" and state.get("section_id"):
+        generated_ids = {s.get("id") for s in state.get("report_sections") or []}
+        if state["section_id"] in generated_ids:
+            return "deepen_section"
+    return "orchestrator"
+
+
+@timed(NODE_DURATION, node="process_section")
 def process_section_node(state: AgentState) -> AgentState:
     """
     Node qui traite une section : détermine quelle section traiter et prépare la requête
     """
     sections = state.get("sections_to_process", [])
-    completed = state.get("completed_sections", [])
+    completed = state.get("report_sections") or []
     current_index = state.get("current_section_index", 0)
     
+    # Sauter les sections déjà traitées (ex: sections traitées en parallèle)
+    completed_ids = {s.get("id") for s in completed}
+    while current_index < len(sections) and sections[current_index] in completed_ids:
+        current_index += 1
+    state["current_section_index"] = current_index
+    
     # Vérification de sécurité : éviter les boucles infinies
     if not sections or len(sections) == 0:
         state["current_step"] = "completed"
@@ -73,7 +207,7 @@ def process_section_node(state: AgentState) -> AgentState:
     state["current_step"] = "process_section"
     
     # Construire la requête pour cette section
-    query = f"{current_section} pour le marché {state['market_name']} en {state['geography']}"
+    query = build_section_query(current_section, state['market_name'], state['geography'])
     state["current_query"] = query
     
     # Mettre à jour la progression
@@ -89,12 +223,15 @@ def process_section_node(state: AgentState) -> AgentState:
     return state
 
 
-def cascade_research_node(state: AgentState) -> AgentState:
+@timed(NODE_DURATION, node="cascade_research")
+async def cascade_research_node(state: AgentState) -> AgentState:
     """
     Node de recherche en cascade : INTERNE → WEB → ESTIMATION
     Avec logique spéciale pour les sections nécessitant des données chiffrées
+    En mode CASCADE_MODE=speculative, INTERNE et WEB sont lancés en parallèle
     """
-    from app.tools.rag_tool import search_internal_knowledge
+    from app.tools.rag_tool import aretrieve_internal_knowledge
+    from app.models.retrieval import RetrievalResult
     from app.tools.linkup_search_tool import linkup_web_search
     from app.tools.estimation_tool import estimate_market_data
     import re
@@ -106,6 +243,24 @@ def cascade_research_node(state: AgentState) -> AgentState:
     
     source_history = []
     state["current_step"] = "cascade_research"
+    state["cached_section"] = None
+    state["section_cache_key"] = None
+    
+    # === Section déjà générée pour ce marché (cache partagé entre rapports) ===
+    # Un approfondissement régénère toujours la section, sans lire ni écrire le cache : sa
+    # recherche (web approfondie, sans chunks préchargés) ne correspond pas à la clé du cache
+    if Config.SECTION_CACHE_ENABLED and not state.get("deepening"):
+        state["section_cache_key"] = await run_blocking(_section_cache_key, state, section)
+        cached = await run_blocking(_get_cached_section, state["section_cache_key"])
+        if cached is not None:
+            state["cached_section"] = cached
+            state["final_source"] = cached.get("source")
+            state["confidence_score"] = cached.get("confidence_score", 0.0)
+            state["source_history"] = cached.get("source_history", []) + [
+                {"step": 0, "source": "CACHE", "status": "cached"}
+            ]
+            CASCADE_OUTCOMES.inc(source="CACHE")
+            return state
     
     # === SECTIONS QUI NÉCESSITENT OBLIGATOIREMENT DES DONNÉES CHIFFRÉES ===
     quantitative_sections = [
@@ -120,13 +275,7 @@ def cascade_research_node(state: AgentState) -> AgentState:
     requires_numbers = any(qs in section for qs in quantitative_sections)
     
     # === SECTIONS DE SYNTHÈSE qui utilisent les données des sections précédentes ===
-    synthesis_sections = [
-        "3.1 Synthèse",
-        "3.2 Risques",
-        "3.3 Leviers",
-        "3.4 Prochaines"
-    ]
-    is_synthesis = any(ss in section for ss in synthesis_sections)
+    is_synthesis = is_synthesis_section(section)
     
     def has_numeric_data(content: str) -> bool:
         """Vérifie si le contenu contient des données numériques exploitables"""
@@ -166,7 +315,7 @@ def cascade_research_node(state: AgentState) -> AgentState:
     
     # === Pour les sections de SYNTHÈSE, utiliser les données des sections précédentes ===
     if is_synthesis:
-        previous_sections = state.get("report_sections", [])
+        previous_sections = in_plan_order(state.get("report_sections") or [])
         if previous_sections:
             # Compiler un résumé des données des sections précédentes
             synthesis_context = f"DONNÉES DES SECTIONS PRÉCÉDENTES pour {market_name} en {geography}:\n\n"
@@ -180,27 +329,80 @@ def cascade_research_node(state: AgentState) -> AgentState:
             state["confidence_score"] = 0.8
             state["source_history"] = [{"step": 0, "source": "SYNTHESE", "status": "compiled"}]
             state["has_numeric_data"] = True
+            CASCADE_OUTCOMES.inc(source="SYNTHESE")
             return state
     
+    if requires_numbers:
+        web_query = f"{query} chiffres données statistiques taille marché parts de marché {market_name} {geography}"
+    else:
+        web_query = query
+    # Approfondissement : recherche Linkup "deep"
+    web_depth = "deep" if state.get("deepening") else "standard"
+    
+    # Variables spécifiques selon le type de section
+    if "Sizing" in section or "TAM" in section:
+        variables = f"TAM SAM SOM taille marché {market_name} {geography} en milliards d'euros. IMPORTANT: Si des données internes mentionnent un TAM de 7 Md€, utilise cette valeur comme base."
+    elif "Segmentation" in section:
+        variables = f"Segmentation marché {market_name} {geography} par catégorie de produit avec pourcentages"
+    elif "acteurs" in section.lower() or "Principaux" in section:
+        variables = f"Parts de marché principaux acteurs {market_name} {geography} avec noms réels et pourcentages"
+    elif "Chiffres clés" in section:
+        variables = f"Chiffres clés acteurs marché {market_name} {geography} CA parts de marché"
+    elif "Tendances" in section:
+        variables = f"Tendances et drivers marché {market_name} {geography} avec données chiffrées sur la croissance"
+    elif "Facteurs" in section:
+        variables = f"Facteurs clés d'achat marché {market_name} {geography} avec importance relative en %"
+    elif "Positionnement" in section:
+        variables = f"Positionnement relatif acteurs marché {market_name} {geography} mapping concurrentiel"
+    else:
+        variables = query
+    
+    def estimation_context(internal_data: str, web_data: str) -> str:
+        """Context enrichi avec les données INTERNE et WEB trouvées (même partielles)"""
+        context_parts = [f"Marché: {market_name}", f"Géographie: {geography}", f"Section: {section}"]
+        
+        # Ajouter les données INTERNE si disponibles
+        if internal_data and len(internal_data) > 50:
+            context_parts.append(f"\nDONNÉES INTERNES DISPONIBLES (à utiliser comme base):\n{internal_data[:1000]}")
+        
+        # Ajouter les données WEB si disponibles
+        if web_data and len(web_data) > 50:
+            context_parts.append(f"\nDONNÉES WEB DISPONIBLES (à utiliser comme référence):\n{web_data[:1000]}")
+        
+        return "\n".join(context_parts)
+    
+    # Résultat INTERNE pré-calculé par la recherche groupée de l'orchestrateur (absent en approfondissement)
+    prefetched = (state.get("prefetched_internal_results") or {}).get(section)
+    
+    # Mode spéculatif : sans résultat pré-calculé, la recherche WEB démarre en même temps que la
+    # recherche INTERNE, elle est annulée si le résultat INTERNE est accepté
+    speculative = Config.CASCADE_MODE == "speculative"
+    web_task = None
+    estimation_task = None
+    if speculative and prefetched is None:
+        web_task = asyncio.create_task(linkup_web_search.ainvoke({"query": web_query, "depth": web_depth}))
+    
     # === Étape 1 : Recherche INTERNE ===
     state["step_details"] = {
         "message": f"Recherche INTERNE pour {section}...",
         "source": "INTERNE"
     }
-    internal_result = search_internal_knowledge.invoke({"query": query})
-    
-    has_results = "Aucune information" not in internal_result and "configuration manquante" not in internal_result
-    
-    # Extraire le score de similarité
-    best_similarity = 0.0
-    if has_results:
-        similarity_match = re.search(r'\[BEST_SIMILARITY:\s*([\d.]+)\]', internal_result)
-        if similarity_match:
-            best_similarity = float(similarity_match.group(1))
+    try:
+        if prefetched is not None:
+            retrieval = RetrievalResult(**prefetched)
         else:
-            similarity_matches = re.findall(r'Similarity:\s*([\d.]+)', internal_result)
-            if similarity_matches:
-                best_similarity = max(float(s) for s in similarity_matches)
+            retrieval = await aretrieve_internal_knowledge(query, k=state.get("retrieval_k") or 3)
+    except BaseException:
+        if web_task is not None:
+            web_task.cancel()
+        raise
+    
+    has_results = retrieval.has_results
+    best_similarity = retrieval.best_similarity
+    # Raccourci lexical (sans embedding) : couverture des termes, pas une similarité dense
+    lexical_match = best_similarity == 0.0 and retrieval.best_lexical_score >= Config.RAG_LEXICAL_SHORTCUT
+    internal_found = has_results and (best_similarity > 0.80 or lexical_match)
+    internal_result = retrieval.context_text()
     
     internal_has_numbers = has_numeric_data(internal_result) if has_results else False
     
@@ -210,8 +412,9 @@ def cascade_research_node(state: AgentState) -> AgentState:
     source_history.append({
         "step": 1,
         "source": "INTERNE",
-        "status": "found" if has_results and best_similarity > 0.80 else "not_found",
+        "status": "found" if internal_found else "not_found",
         "score": best_similarity,
+        "lexical_score": retrieval.best_lexical_score,
         "has_numbers": internal_has_numbers
     })
     
@@ -224,32 +427,56 @@ def cascade_research_node(state: AgentState) -> AgentState:
     is_section_relevant = keyword_match_count >= 2
     
     if requires_numbers:
-        internal_valid = (has_results and best_similarity > 0.80 and 
+        internal_valid = (internal_found and 
                          is_content_sufficient and is_section_relevant and internal_has_numbers)
     else:
-        internal_valid = (has_results and best_similarity > 0.80 and 
+        internal_valid = (internal_found and 
                          is_content_sufficient and is_section_relevant)
     
     if internal_valid:
-        state["internal_result"] = {"content": internal_result, "score": best_similarity}
+        if web_task is not None:
+            # Annuler la requête WEB encore en vol
+            web_task.cancel()
+            source_history.append({"step": 2, "source": "WEB", "status": "cancelled"})
+        state["internal_result"] = {
+            "content": internal_result,
+            "score": best_similarity,
+            "lexical_score": retrieval.best_lexical_score,
+            "sources": sorted({chunk.file_name for chunk in retrieval.chunks})
+        }
         state["final_source"] = "INTERNE"
-        state["confidence_score"] = min(0.9, best_similarity * 0.95)
+        if best_similarity > 0.80:
+            state["confidence_score"] = min(0.9, best_similarity * 0.95)
+        else:
+            state["confidence_score"] = Config.RAG_LEXICAL_CONFIDENCE
         state["source_history"] = source_history
         state["has_numeric_data"] = internal_has_numbers
+        CASCADE_OUTCOMES.inc(source="INTERNE")
         return state
     
+    # Estimation anticipée : l'INTERNE est rejeté, on lance l'ESTIMATION (avec les seules données
+    # INTERNE) pendant que la recherche WEB se termine ; elle est annulée si le WEB est accepté
+    if speculative and Config.CASCADE_EARLY_ESTIMATION:
+        estimation_task = asyncio.create_task(estimate_market_data.ainvoke({
+            "context": estimation_context(state["internal_data_for_estimation"], ""),
+            "variables": variables
+        }))
+    
     # === Étape 2 : Recherche WEB ===
     state["step_details"] = {
         "message": f"Recherche WEB pour {section}...",
         "source": "WEB"
     }
     
-    if requires_numbers:
-        web_query = f"{query} chiffres données statistiques taille marché parts de marché {market_name} {geography}"
-    else:
-        web_query = query
-    
-    web_result = linkup_web_search.invoke({"query": web_query})
+    try:
+        if web_task is not None:
+            web_result = await web_task
+        else:
+            web_result = await linkup_web_search.ainvoke({"query": web_query, "depth": web_depth})
+    except BaseException:
+        if estimation_task is not None:
+            estimation_task.cancel()
+        raise
     web_has_numbers = has_numeric_data(web_result) if web_result else False
     web_is_useful = has_useful_content(web_result)
     
@@ -265,11 +492,14 @@ def cascade_research_node(state: AgentState) -> AgentState:
     
     # Accepter WEB seulement si contenu utile ET (pas besoin de chiffres OU a des chiffres)
     if web_is_useful and (not requires_numbers or web_has_numbers):
+        if estimation_task is not None:
+            estimation_task.cancel()
         state["web_result"] = {"content": web_result, "score": 0.7}
         state["final_source"] = "WEB"
         state["confidence_score"] = 0.7
         state["source_history"] = source_history
         state["has_numeric_data"] = web_has_numbers
+        CASCADE_OUTCOMES.inc(source="WEB")
         return state
     
     # === Étape 3 : ESTIMATION (toujours si on arrive ici) ===
@@ -278,48 +508,22 @@ def cascade_research_node(state: AgentState) -> AgentState:
         "source": "ESTIMATION"
     }
     
-    # Context enrichi avec les données INTERNE et WEB trouvées (même partielles)
-    context_parts = [f"Marché: {market_name}", f"Géographie: {geography}", f"Section: {section}"]
-    
-    # Ajouter les données INTERNE si disponibles
-    internal_data = state.get("internal_data_for_estimation", "")
-    if internal_data and len(internal_data) > 50:
-        context_parts.append(f"\nDONNÉES INTERNES DISPONIBLES (à utiliser comme base):\n{internal_data[:1000]}")
-    
-    # Ajouter les données WEB si disponibles
-    web_data = state.get("web_data_for_estimation", "")
-    if web_data and len(web_data) > 50:
-        context_parts.append(f"\nDONNÉES WEB DISPONIBLES (à utiliser comme référence):\n{web_data[:1000]}")
-    
-    context = "\n".join(context_parts)
-    
-    # Variables spécifiques selon le type de section
-    if "Sizing" in section or "TAM" in section:
-        variables = f"TAM SAM SOM taille marché {market_name} {geography} en milliards d'euros. IMPORTANT: Si des données internes mentionnent un TAM de 7 Md€, utilise cette valeur comme base."
-    elif "Segmentation" in section:
-        variables = f"Segmentation marché {market_name} {geography} par catégorie de produit avec pourcentages"
-    elif "acteurs" in section.lower() or "Principaux" in section:
-        variables = f"Parts de marché principaux acteurs {market_name} {geography} avec noms réels et pourcentages"
-    elif "Chiffres clés" in section:
-        variables = f"Chiffres clés acteurs marché {market_name} {geography} CA parts de marché"
-    elif "Tendances" in section:
-        variables = f"Tendances et drivers marché {market_name} {geography} avec données chiffrées sur la croissance"
-    elif "Facteurs" in section:
-        variables = f"Facteurs clés d'achat marché {market_name} {geography} avec importance relative en %"
-    elif "Positionnement" in section:
-        variables = f"Positionnement relatif acteurs marché {market_name} {geography} mapping concurrentiel"
+    if estimation_task is not None:
+        estimation_result = await estimation_task
     else:
-        variables = query
-    
-    estimation_result = estimate_market_data.invoke({
-        "context": context,
-        "variables": variables
-    })
+        estimation_result = await estimate_market_data.ainvoke({
+            "context": estimation_context(
+                state.get("internal_data_for_estimation", ""),
+                state.get("web_data_for_estimation", "")
+            ),
+            "variables": variables
+        })
     
     source_history.append({
         "step": 3,
         "source": "ESTIMATION",
-        "status": "estimated"
+        "status": "estimated",
+        "early": estimation_task is not None
     })
     
     state["estimation_result"] = {"content": estimation_result, "score": 0.5}
@@ -327,16 +531,46 @@ def cascade_research_node(state: AgentState) -> AgentState:
     state["confidence_score"] = 0.5
     state["source_history"] = source_history
     state["has_numeric_data"] = True
+    CASCADE_OUTCOMES.inc(source="ESTIMATION")
     
     return state
 
 
-def report_generation_node(state: AgentState) -> AgentState:
+def _record_section(state: AgentState, section_data: dict) -> AgentState:
     """
-    Node de génération de rapport : assemble les sections avec formatage
+    Ajouter une section générée à l'état et mettre à jour l'index et la progression.
+    Seule la nouvelle section est renvoyée : le reducer merge_sections l'insère dans report_sections.
     """
-    from langchain_openai import ChatOpenAI
+    state["report_sections"] = [section_data]
+    
+    # Approfondissement d'une seule section : le rapport est terminé
+    if state.get("deepening"):
+        state["progress_percentage"] = 1.0
+        return state
+    
+    # Mettre à jour l'index et la progression
+    current_index = state.get("current_section_index", 0)
+    sections = state.get("sections_to_process", [])
+    total = state.get("total_sections", len(sections) if sections else 1)
     
+    # Incrémenter l'index seulement si on n'a pas dépassé
+    if current_index < len(sections):
+        state["current_section_index"] = current_index + 1
+    else:
+        state["current_section_index"] = len(sections)
+    
+    # Mettre à jour la progression
+    state["progress_percentage"] = min(1.0, (current_index + 1) / total) if total > 0 else 1.0
+    state["total_sections"] = total
+    
+    return state
+
+
+@timed(NODE_DURATION, node="report_generation")
+async def report_generation_node(state: AgentState) -> AgentState:
+    """
+    Node de génération de rapport : assemble les sections avec formatage
+    """
     state["current_step"] = "report_generation"
     section = state.get("current_section", "")
     
@@ -345,11 +579,16 @@ def report_generation_node(state: AgentState) -> AgentState:
         "section": section
     }
     
-    llm = ChatOpenAI(
-        model=Config.OPENAI_MODEL,
-        temperature=0.3,
-        api_key=Config.OPENAI_API_KEY
-    )
+    # Section servie par le cache partagé : pas d'appel LLM
+    cached_section = state.get("cached_section")
+    if cached_section is not None:
+        return _record_section(state, {
+            **cached_section,
+            "source_history": state.get("source_history", []),
+            "cached": True
+        })
+    
+    llm = get_llm(temperature=0.3)
     
     # Récupérer les résultats de la cascade
     if state.get("final_source") == "INTERNE":
@@ -361,30 +600,7 @@ def report_generation_node(state: AgentState) -> AgentState:
     else:
         content = state.get("estimation_result", {}).get("content", "")
     
-    # Nettoyer le contenu RAG pour éviter les répétitions
-    # Si le contenu contient plusieurs chunks avec headers [Source: ...], on les consolide
-    if state.get("final_source") == "INTERNE" and "[Source:" in content:
-        # Extraire uniquement le contenu sans les headers répétitifs
-        lines = content.split('\n')
-        cleaned_lines = []
-        skip_next = False
-        for i, line in enumerate(lines):
-            if line.strip().startswith('[Source:'):
-                # Garder seulement le premier header de source
-                if not any('[Source:' in prev_line for prev_line in cleaned_lines):
-                    cleaned_lines.append(line)
-                skip_next = False
-            elif line.strip() == '---':
-                # Ignorer les séparateurs entre chunks
-                skip_next = True
-            elif not skip_next:
-                cleaned_lines.append(line)
-        content = '\n'.join(cleaned_lines)
-        # Ajouter un header de source unique au début
-        if content and not content.startswith('[Source:'):
-            source_match = content.split('\n')[0] if content else ""
-            if '[Source:' in source_match:
-                content = source_match + '\n\n' + '\n'.join(cleaned_lines[1:]) if len(cleaned_lines) > 1 else content
+    # Le contenu INTERNE est déjà consolidé par RetrievalResult.context_text() (un seul header [Source: ...])
     
     # Prompt différencié selon la source
     final_source = state.get('final_source', 'UNKNOWN')
@@ -499,13 +715,19 @@ Format de sortie :
         ("user", user_content)
     ])
     
+    generation_failed = False
     try:
         chain = prompt | llm
         # Pas de variables à passer car tout est déjà intégré dans le prompt
-        formatted_section = chain.invoke({})
+        # Tag + section_id : les tokens sont relayés en événements SSE section_delta (astream_events)
+        formatted_section = await chain.ainvoke({}, config={
+            "tags": [SECTION_CONTENT_TAG],
+            "metadata": {"section_id": section}
+        })
         formatted_content = formatted_section.content if hasattr(formatted_section, 'content') else str(formatted_section)
     except Exception as e:
         # En cas d'erreur, essayer de formater au moins le début du contenu
+        generation_failed = True
         error_msg = str(e)
         # Ne pas afficher le contenu source brut s'il est trop long ou contient des répétitions
         if len(content) > 500 or content.count('[Source:') > 1:
@@ -525,62 +747,56 @@ Format de sortie :
         "source_history": state.get("source_history", []),
         "can_deepen": True
     }
-    
-    completed = state.get("completed_sections", [])
-    completed.append(section_data)
-    state["completed_sections"] = completed
-    
-    report_sections = state.get("report_sections", [])
-    report_sections.append(section_data)
-    state["report_sections"] = report_sections
-    
-    # Mettre à jour l'index et la progression
-    current_index = state.get("current_section_index", 0)
-    sections = state.get("sections_to_process", [])
-    total = state.get("total_sections", len(sections) if sections else 1)
-    
-    # Incrémenter l'index seulement si on n'a pas dépassé
-    if current_index < len(sections):
-        state["current_section_index"] = current_index + 1
-    else:
-        state["current_section_index"] = len(sections)
-    
-    # Mettre à jour la progression
-    state["progress_percentage"] = min(1.0, (current_index + 1) / total) if total > 0 else 1.0
-    state["total_sections"] = total
-    
-    return state
+    if state.get("deepening"):
+        section_data["deepened"] = True
+    
+    # Mettre en cache la section pour les rapports suivants (sauf erreur de génération ;
+    # pas de clé pour un approfondissement)
+    if state.get("section_cache_key") and not generation_failed:
+        try:
+            await run_blocking(_store_cached_section, state["section_cache_key"], section_data)
+        except Exception as e:
+            print(f"⚠️  Could not cache section {section}: {e}")
+    
+    return _record_section(state, section_data)
+
 
+def needs_expert(section: dict) -> bool:
+    """Sections avec un score de confiance < 0.7 : recommandation d'expert (pas seulement < 0.5)"""
+    return section.get("confidence_score", 1.0) < 0.7
 
-def expert_recommendation_node(state: AgentState) -> AgentState:
+
+def _expert_cache_key(section: dict, market_name: str, geography: str) -> str:
     """
-    Node de détection d'incertitude et recommandation d'expert SPÉCIFIQUE AU MARCHÉ
+    Clé du cache des recommandations : les entrées du prompt (section, marché, géographie,
+    confiance, source), indépendantes du type de mission comme les sections
     """
-    from langchain_openai import ChatOpenAI
-    from langchain.prompts import ChatPromptTemplate
-    
-    state["current_step"] = "expert_recommendation"
-    state["step_details"] = {"message": "Analyse des zones d'incertitude..."}
-    
-    recommendations = []
-    report_sections = state.get("report_sections", [])
-    market_name = state.get("market_name", "")
-    geography = state.get("geography", "")
-    
-    llm = ChatOpenAI(
-        model=Config.OPENAI_MODEL,
-        temperature=0.3,
-        api_key=Config.OPENAI_API_KEY
+    return cache_key(
+        "expert_recommendation", section.get("title", "Unknown"), market_name, geography,
+        f"{section.get('confidence_score', 1.0):.4f}", section.get("source", "UNKNOWN")
     )
-    
-    for section in report_sections:
-        confidence = section.get("confidence_score", 1.0)
-        # Recommander un expert pour les sections avec score < 0.7 (pas seulement < 0.5)
-        if confidence < 0.7:
-            section_title = section.get('title', 'Unknown')
-            source = section.get('source', 'UNKNOWN')
-            
-            system_msg = """Tu génères des recommandations d'expert pour les zones d'incertitude d'une étude de marché.
+
+
+async def _generate_expert_recommendation(section: dict, market_name: str, geography: str) -> dict:
+    """
+    Recommandation d'expert SPÉCIFIQUE AU MARCHÉ pour une section (un appel LLM, sauf si
+    elle est dans le cache des sections)
+    """
+    confidence = section.get("confidence_score", 1.0)
+    section_title = section.get('title', 'Unknown')
+    source = section.get('source', 'UNKNOWN')
+    
+    key = _expert_cache_key(section, market_name, geography) if Config.SECTION_CACHE_ENABLED else None
+    if key:
+        cached = await run_blocking(_get_cached_section, key)
+        if cached is not None:
+            return {
+                "section_id": section.get("id", ""),
+                "section_title": section.get("title", ""),
+                "recommendation": cached.get("recommendation", "")
+            }
+    
+    system_msg = """Tu génères des recommandations d'expert pour les zones d'incertitude d'une étude de marché.
 
 RÈGLE IMPORTANTE : L'expert recommandé doit être un SPÉCIALISTE DU MARCHÉ ÉTUDIÉ, pas un expert généraliste.
 
@@ -594,32 +810,141 @@ Pour chaque zone avec score < 0.5, génère :
    - 5-7 questions spécifiques au marché étudié
    - Questions sur les données manquantes de la section
    - Focus sur les insights terrain et données propriétaires"""
-            
-            user_msg = f"Section: {section_title}\nMarché étudié: {market_name}\nGéographie: {geography}\nScore de confiance: {confidence}\nSource utilisée: {source}\n\nGénère la recommandation d'expert SPÉCIFIQUE au marché {market_name}."
-            
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", system_msg),
-                ("user", user_msg)
-            ])
-            
-            try:
-                chain = prompt | llm
-                recommendation = chain.invoke({})
-                rec_content = recommendation.content if hasattr(recommendation, 'content') else str(recommendation)
-                
-                recommendations.append({
-                    "section_id": section.get("id", ""),
-                    "section_title": section.get("title", ""),
-                    "recommendation": rec_content
-                })
-            except Exception as e:
-                recommendations.append({
-                    "section_id": section.get("id", ""),
-                    "section_title": section.get("title", ""),
-                    "recommendation": f"Erreur lors de la génération de recommandation: {str(e)}"
-                })
-    
-    state["expert_recommendations"] = recommendations
+    
+    user_msg = f"Section: {section_title}\nMarché étudié: {market_name}\nGéographie: {geography}\nScore de confiance: {confidence}\nSource utilisée: {source}\n\nGénère la recommandation d'expert SPÉCIFIQUE au marché {market_name}."
+    
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", system_msg),
+        ("user", user_msg)
+    ])
+    
+    try:
+        chain = prompt | get_llm(temperature=0.3)
+        recommendation = await chain.ainvoke({})
+        rec_content = recommendation.content if hasattr(recommendation, 'content') else str(recommendation)
+    except Exception as e:
+        rec_content = f"Erreur lors de la génération de recommandation: {str(e)}"
+        key = None  # Pas de mise en cache d'une erreur
+    
+    if key:
+        try:
+            await run_blocking(_store_cached_section, key, {"recommendation": rec_content})
+        except Exception as e:
+            print(f"⚠️  Could not cache expert recommendation for {section_title}: {e}")
+    
+    return {
+        "section_id": section.get("id", ""),
+        "section_title": section.get("title", ""),
+        "recommendation": rec_content
+    }
+
+
+def fan_out_expert_recommendations(state: AgentState):
+    """
+    Map : une recommandation d'expert par section incertaine, générées en parallèle par des
+    expert_worker (dans la limite de WORKFLOW_MAX_CONCURRENCY) et streamées dès qu'elles sont prêtes.
+    """
+    sends = [
+        Send("expert_worker", {
+            "market_name": state.get("market_name", ""),
+            "geography": state.get("geography", ""),
+            "section": section
+        })
+        for section in state.get("report_sections", [])
+        if needs_expert(section)
+    ]
+    return sends or "expert_recommendation"
+
+
+@timed(NODE_DURATION, node="expert_worker")
+async def expert_worker_node(state: dict) -> dict:
+    """
+    Worker parallèle : recommandation d'expert pour une section.
+    Fusionnée dans l'état par le reducer merge_recommendations.
+    """
+    recommendation = await _generate_expert_recommendation(state["section"], state["market_name"], state["geography"])
+    return {"expert_recommendations": [recommendation]}
+
+
+@timed(NODE_DURATION, node="expert_recommendation")
+async def expert_recommendation_node(state: AgentState) -> AgentState:
+    """
+    Node de détection d'incertitude et recommandation d'expert SPÉCIFIQUE AU MARCHÉ.
+    Point de synchronisation après les expert_worker : génère les recommandations encore manquantes.
+    """
+    state["current_step"] = "expert_recommendation"
+    state["step_details"] = {"message": "Analyse des zones d'incertitude..."}
+    
+    market_name = state.get("market_name", "")
+    geography = state.get("geography", "")
+    done = {rec.get("section_id") for rec in state.get("expert_recommendations") or []}
+    missing = [s for s in state.get("report_sections", []) if needs_expert(s) and s.get("id", "") not in done]
+    
+    recommendations = await asyncio.gather(*(
+        _generate_expert_recommendation(section, market_name, geography) for section in missing
+    ))
+    # Seules les nouvelles recommandations sont renvoyées (fusionnées par merge_recommendations)
+    state["expert_recommendations"] = list(recommendations)
+    return state
+
+
+def fan_out_sections(state: AgentState):
+    """
+    Map : envoie chaque section non-synthèse à un section_worker (exécutés en parallèle,
+    dans la limite de WORKFLOW_MAX_CONCURRENCY).
+    """
+    sections = state.get("sections_to_process", [])
+    prefetched = state.get("prefetched_internal_results") or {}
+    
+    sends = []
+    for index, section in enumerate(sections):
+        if is_synthesis_section(section):
+            continue
+        sends.append(Send("section_worker", {
+            "market_name": state["market_name"],
+            "geography": state["geography"],
+            "mission_type": state.get("mission_type"),
+            "client_website": state.get("client_website"),
+            "conversation_id": state.get("conversation_id"),
+            "sections_to_process": sections,
+            "total_sections": len(sections),
+            "current_section_index": index,
+            "current_section": section,
+            "current_query": build_section_query(section, state["market_name"], state["geography"]),
+            "prefetched_internal_results": {section: prefetched[section]} if section in prefetched else {},
+            "report_sections": []
+        }))
+    
+    return sends or "collect_sections"
+
+
+@timed(NODE_DURATION, node="section_worker")
+async def section_worker_node(state: dict) -> dict:
+    """
+    Worker parallèle : recherche en cascade + génération d'une section.
+    Ne renvoie que la section produite, fusionnée dans l'état par le reducer merge_sections.
+    """
+    section_state = await report_generation_node(await cascade_research_node(dict(state)))
+    section_data = section_state["report_sections"][-1]
+    return {"report_sections": [section_data]}
+
+
+@timed(NODE_DURATION, node="collect_sections")
+def collect_sections_node(state: AgentState) -> AgentState:
+    """
+    Reduce : point de synchronisation après les workers parallèles.
+    Les sections de synthèse (3.x) sont ensuite traitées par la boucle séquentielle.
+    """
+    sections = state.get("sections_to_process", [])
+    completed_ids = {s.get("id") for s in state.get("report_sections") or []}
+    
+    state["current_section_index"] = next(
+        (i for i, section in enumerate(sections) if section not in completed_ids), len(sections)
+    )
+    state["current_step"] = "collect_sections"
+    state["progress_percentage"] = len(completed_ids) / len(sections) if sections else 1.0
+    state["step_details"] = {"message": f"{len(completed_ids)}/{len(sections)} sections générées, passage à la synthèse..."}
+    
     return state
 
 
@@ -628,7 +953,7 @@ def should_continue(state: AgentState) -> str:
     Détermine si on doit continuer à traiter des sections ou terminer
     """
     sections = state.get("sections_to_process", [])
-    completed = state.get("completed_sections", [])
+    completed = state.get("report_sections") or []
     current_index = state.get("current_section_index", 0)
     
     # Vérifier si toutes les sections sont complétées
@@ -639,43 +964,106 @@ def should_continue(state: AgentState) -> str:
         return "process_section"
 
 
-def create_workflow_graph():
+def route_after_section(state: AgentState):
+    """
+    Après process_section : section suivante, ou recommandations d'expert en parallèle
+    une fois toutes les sections traitées
+    """
+    next_step = should_continue(state)
+    if next_step == "expert_recommendation":
+        return fan_out_expert_recommendations(state)
+    return next_step
+
+
+def as_update(node):
+    """
+    Adapte un node qui modifie et renvoie l'état complet : seules les clés auxquelles il a
+    affecté une nouvelle valeur sont renvoyées à LangGraph (mises à jour streamées et fusionnées),
+    au lieu d'une copie de tout l'état à chaque étape.
+    """
+    def changed_keys(state: dict, result: dict) -> dict:
+        return {key: value for key, value in result.items() if key not in state or state[key] is not value}
+    
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_update_node(state: AgentState) -> dict:
+            return changed_keys(state, await node(dict(state)))
+        return async_update_node
+    
+    @functools.wraps(node)
+    def update_node(state: AgentState) -> dict:
+        return changed_keys(state, node(dict(state)))
+    return update_node
+
+
+def route_after_report(state: AgentState) -> str:
+    """
+    Après report_generation : fin pour un approfondissement (deepen_section exécuté), sinon
+    section suivante. Un "deepen" retombé sur l'orchestrateur génère le rapport complet.
+    """
+    if state.get("deepening"):
+        return END
+    return "process_section"
+
+
+def create_workflow_graph(mode: str = None, checkpointer=None):
     """
     Crée le graph LangGraph avec tous les nodes
+    
+    Args:
+        mode: "parallel" (map-reduce des sections 1.x/2.x puis synthèse 3.x) ou
+              "sequential" (une section après l'autre). Par défaut Config.WORKFLOW_MODE.
+        checkpointer: Checkpointer LangGraph (état persistant par conversation_id, requis pour "deepen")
     """
+    mode = mode or Config.WORKFLOW_MODE
     workflow = StateGraph(AgentState)
     
-    # Ajouter les nodes
-    workflow.add_node("orchestrator", orchestrator_node)
-    workflow.add_node("process_section", process_section_node)
-    workflow.add_node("cascade_research", cascade_research_node)
-    workflow.add_node("report_generation", report_generation_node)
-    workflow.add_node("expert_recommendation", expert_recommendation_node)
+    # Ajouter les nodes (chaque node ne renvoie que ses mises à jour de l'état)
+    workflow.add_node("orchestrator", as_update(orchestrator_node))
+    workflow.add_node("deepen_section", as_update(deepen_section_node))
+    workflow.add_node("process_section", as_update(process_section_node))
+    workflow.add_node("cascade_research", as_update(cascade_research_node))
+    workflow.add_node("report_generation", as_update(report_generation_node))
+    workflow.add_node("expert_recommendation", as_update(expert_recommendation_node))
+    workflow.add_node("expert_worker", expert_worker_node)
     
     # Définir le flux
-    workflow.set_entry_point("orchestrator")
-    
-    workflow.add_edge("orchestrator", "process_section")
+    workflow.set_conditional_entry_point(route_entry, ["orchestrator", "deepen_section"])
+    workflow.add_edge("deepen_section", "cascade_research")
+    
+    if mode == "parallel":
+        workflow.add_node("section_worker", section_worker_node)
+        workflow.add_node("collect_sections", as_update(collect_sections_node))
+        workflow.add_conditional_edges("orchestrator", fan_out_sections, ["section_worker", "collect_sections"])
+        workflow.add_edge("section_worker", "collect_sections")
+        workflow.add_edge("collect_sections", "process_section")
+    else:
+        workflow.add_edge("orchestrator", "process_section")
     workflow.add_conditional_edges(
         "process_section",
-        should_continue,
+        route_after_section,
         {
             "process_section": "cascade_research",
+            "expert_worker": "expert_worker",
             "expert_recommendation": "expert_recommendation"
         }
     )
     workflow.add_edge("cascade_research", "report_generation")
-    workflow.add_edge("report_generation", "process_section")  # Loop pour traiter la section suivante
+    workflow.add_conditional_edges("report_generation", route_after_report, ["process_section", END])  # Loop pour traiter la section suivante
+    workflow.add_edge("expert_worker", "expert_recommendation")
     workflow.add_edge("expert_recommendation", END)
     
     # Compiler le graph avec une limite de récursion plus élevée
     # (par défaut 25, on met 50 pour gérer jusqu'à 50 sections)
-    app = workflow.compile()
+    app = workflow.compile(checkpointer=checkpointer)
     
     # Configurer la limite de récursion (si supporté par la version de LangGraph)
     try:
         # Certaines versions de LangGraph supportent checkpointer avec limite
-        app = app.with_config({"recursion_limit": 50})
+        app = app.with_config({
+            "recursion_limit": 50,
+            "max_concurrency": Config.WORKFLOW_MAX_CONCURRENCY
+        })
     except Exception:
         # Si la méthode n'existe pas, on continue sans
         pass
@@ -1,17 +1,29 @@
 """FastAPI application for KPMG AI Agent"""
+import time
+_import_started = time.perf_counter()
+
 import os
 # Disable ChromaDB telemetry early (before any imports that might use ChromaDB)
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 
+# Les stacks lourdes (langchain, langgraph, chromadb, unstructured) ne sont importées qu'au
+# warmup en arrière-plan ou au premier usage : l'import de ce module reste rapide
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from app.models.request import ReportRequest, ReportResponse
-from app.graph.workflow import create_workflow_graph
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from app.models.request import ReportRequest, ReportResponse, JobResponse
+from app.graph.checkpoint import (
+    open_checkpointer, close_checkpointer, thread_config, load_conversation_state, save_conversation_state
+)
+from app.utils.result_cache import cache_key, get_report_cache
+from app.utils.concurrency import run_blocking
+from app.utils.job_queue import Job, JobQueue, QueueFullError
+from app.utils.rate_limit import get_scheduler, llm_priority, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from app.utils.metrics import REGISTRY, SSE_STREAM_DURATION, COALESCED_REQUESTS
 from app.config import Config
+from typing import Optional
 import json
 import uuid
-import time
 import asyncio
 
 
@@ -26,26 +38,132 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize workflow graph
-workflow_app = create_workflow_graph()
+# Workflow graph, compilé en arrière-plan au démarrage (avec le checkpointer persistant)
+workflow_app = None
+checkpointer = None
 
+# Warmup (compilation du workflow, ouverture de l'index RAG persisté) : les jobs de rapports
+# attendent sa fin, /ready répond 503 tant qu'il n'est pas terminé. La ré-indexation des
+# documents modifiés se fait ensuite, sans bloquer les rapports (index actuel servi pendant ce temps)
+warmup_done = asyncio.Event()
+_warmup_task = None
+readiness = {
+    "workflow": False,
+    "rag_index": False,
+    "error": None,
+    "import_seconds": None,
+    "startup_seconds": None,
+    "workflow_seconds": None,
+    "rag_index_seconds": None,
+    "rag_refresh": False,
+    "rag_refresh_seconds": None,
+    "warmup_seconds": None
+}
 
-@app.on_event("startup")
-async def startup_event():
+
+def _compile_workflow(checkpointer):
+    """Import langgraph/langchain and compile the workflow graph"""
+    from app.graph.workflow import create_workflow_graph
+    return create_workflow_graph(checkpointer=checkpointer)
+
+
+def _open_rag_index():
+    """Import the RAG stack (chromadb, loaders) and open the persisted index (None if there is none yet)"""
+    from app.tools.rag_tool import open_persisted_index
+    return open_persisted_index()
+
+
+def _refresh_rag_index():
+    """Scan the documents directory and reindex added, modified and deleted documents"""
+    from app.tools.rag_tool import refresh_index
+    return refresh_index()
+
+
+async def warmup():
     """
-    Initialize RAG vectorstore on server startup
-    This will trigger document indexing and display progress messages
+    Open the checkpointer, compile the workflow and open the RAG index, off the startup path
+    (blocking steps run in the shared thread pool), then reindex changed documents once ready
     """
+    global workflow_app, checkpointer
+    started = time.perf_counter()
+    try:
+        checkpointer = await open_checkpointer()
+        if checkpointer is not None:
+            print(f"💾 Conversation checkpoints: {Config.CHECKPOINT_DB_PATH}")
+    except Exception as e:
+        print(f"⚠️  Warning: Could not open checkpoint database: {e}")
+    
     try:
-        from app.tools.rag_tool import _get_vectorstore
+        step_started = time.perf_counter()
+        workflow_app = await run_blocking(_compile_workflow, checkpointer)
+        readiness["workflow"] = True
+        readiness["workflow_seconds"] = round(time.perf_counter() - step_started, 3)
+        print(f"🧩 Workflow compiled in {readiness['workflow_seconds']:.2f}s")
+    except Exception as e:
+        readiness["error"] = f"Could not compile workflow: {e}"
+        print(f"❌ {readiness['error']}")
+    
+    refreshed = False
+    try:
+        step_started = time.perf_counter()
         print("\n🚀 Initializing RAG system...")
-        vectorstore = _get_vectorstore(force_reindex=False)
+        vectorstore = await run_blocking(_open_rag_index)
+        if vectorstore is None:
+            # Aucun index utilisable : il faut le construire avant de servir des rapports
+            vectorstore = await run_blocking(_refresh_rag_index)
+            refreshed = True
+        readiness["rag_index"] = vectorstore is not None
+        readiness["rag_index_seconds"] = round(time.perf_counter() - step_started, 3)
         if vectorstore:
-            print("✅ RAG system ready!\n")
+            print(f"✅ RAG system ready in {readiness['rag_index_seconds']:.2f}s!\n")
         else:
             print("⚠️  RAG system initialized but no documents found.\n")
     except Exception as e:
         print(f"⚠️  Warning: Could not initialize RAG system: {e}\n")
+    
+    readiness["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    warmup_done.set()
+    print(f"⏱️  Warmup completed in {readiness['warmup_seconds']:.2f}s")
+    
+    # Ré-indexation des documents modifiés depuis le dernier démarrage, une fois prêt
+    if not refreshed:
+        try:
+            step_started = time.perf_counter()
+            vectorstore = await run_blocking(_refresh_rag_index)
+            readiness["rag_index"] = vectorstore is not None
+            readiness["rag_refresh_seconds"] = round(time.perf_counter() - step_started, 3)
+        except Exception as e:
+            print(f"⚠️  Warning: Could not refresh RAG index: {e}\n")
+    readiness["rag_refresh"] = True
+
+
+@app.on_event("startup")
+async def startup_event():
+    """
+    Start the report job workers and launch the warmup in the background:
+    the server accepts traffic immediately, /ready reports when reports can run
+    """
+    global _warmup_task
+    started = time.perf_counter()
+    report_jobs.start()
+    print(f"🧵 Report job queue: {report_jobs.workers} workers, max {report_jobs.max_depth} pending jobs")
+    _warmup_task = asyncio.create_task(warmup())
+    readiness["startup_seconds"] = round(time.perf_counter() - started, 3)
+    print(
+        f"⏱️  app.main imported in {readiness['import_seconds']:.2f}s, "
+        f"startup in {readiness['startup_seconds']:.3f}s (warmup running in background)"
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the warmup and the report job workers, close the shared HTTP connection pools and the checkpoint database"""
+    if _warmup_task is not None and not _warmup_task.done():
+        _warmup_task.cancel()
+    await report_jobs.stop()
+    from app.utils.llm import close_http_clients
+    await close_http_clients()
+    await close_checkpointer(checkpointer)
 
 
 def estimate_time_remaining(progress: float, elapsed_time: float) -> int:
@@ -61,108 +179,457 @@ def estimate_time_remaining(progress: float, elapsed_time: float) -> int:
     return max(0, int(remaining))
 
 
-@app.post("/api/generate-report-stream")
-async def generate_report_stream(request: ReportRequest):
+def _report_cache_key(request: ReportRequest) -> str:
+    """Clé du cache de rapports : marché, géographie, type de mission et site client"""
+    return cache_key(request.market_name, request.geography, request.mission_type, request.client_website)
+
+
+def _report_cache_version() -> str:
+    """Version de l'index RAG : un rapport en cache est invalidé à chaque ré-indexation"""
+    from app.tools.rag_tool import get_index_version
+    return get_index_version()
+
+
+async def get_cached_report(request: ReportRequest):
     """
-    Génère un rapport avec streaming en temps réel via SSE
+    Rapport en cache pour cette requête (génération complète uniquement, sauf force_refresh)
+    
+    Returns:
+        (rapport {"sections", "expert_recommendations"} ou None, version de l'index)
+    """
+    if not Config.REPORT_CACHE_ENABLED or request.action == "deepen":
+        return None, None
+    version = await run_blocking(_report_cache_version)
+    if request.force_refresh:
+        return None, version
+    report = await run_blocking(get_report_cache().get, _report_cache_key(request), version)
+    return report, version
+
+
+async def store_report(request: ReportRequest, version: Optional[str], final_state: dict):
+    """
+    Mettre en cache un rapport complet (y compris celui d'un "deepen" retombé sur une
+    génération complète, faute de checkpoint ; version None : lue à ce moment)
     """
+    if not Config.REPORT_CACHE_ENABLED:
+        return
+    if version is None:
+        version = await run_blocking(_report_cache_version)
+    report = {
+        "sections": final_state.get("report_sections") or [],
+        "expert_recommendations": final_state.get("expert_recommendations") or []
+    }
+    await run_blocking(get_report_cache().set, _report_cache_key(request), version, report)
+
+
+async def restore_cached_report(request: ReportRequest, conversation_id: str, report: dict):
+    """Écrire un rapport servi depuis le cache dans le checkpoint de la conversation (pour "deepen")"""
+    try:
+        await save_conversation_state(workflow_app, conversation_id, {
+            "market_name": request.market_name,
+            "geography": request.geography,
+            "mission_type": request.mission_type,
+            "client_website": request.client_website,
+            "conversation_id": conversation_id,
+            "action": request.action,
+            "sections_to_process": [s.get("id", "") for s in report["sections"]],
+            "total_sections": len(report["sections"]),
+            "report_sections": report["sections"],
+            "expert_recommendations": report["expert_recommendations"]
+        })
+    except Exception as e:
+        print(f"⚠️  Warning: Could not checkpoint cached report: {e}")
+
+
+def cached_report_events(report: dict, conversation_id: str):
+    """Rejouer rapidement les événements SSE d'un rapport servi depuis le cache"""
+    sections = report["sections"]
+    total_sections = len(sections)
+    for index, section in enumerate(sections):
+        yield {
+            "type": "progress",
+            "percentage": (index + 1) / total_sections,
+            "step": "report_cache",
+            "node": "report_cache",
+            "details": {"message": f"Section {section.get('title', '')} (cache)"},
+            "section_index": index + 1,
+            "total_sections": total_sections,
+            "estimated_time_remaining": 0
+        }
+        yield {
+            "type": "section_complete",
+            "section": {
+                "id": section.get("id", ""),
+                "title": section.get("title", ""),
+                "source": section.get("source", ""),
+                "confidence_score": section.get("confidence_score", 0.0)
+            },
+            "section_index": index
+        }
+    
+    for recommendation in report["expert_recommendations"]:
+        yield {
+            "type": "expert_recommendation",
+            "recommendation": recommendation
+        }
+    
+    yield {
+        "type": "complete",
+        "sections": sections,
+        "expert_recommendations": report["expert_recommendations"],
+        "conversation_id": conversation_id,
+        "cached": True
+    }
+
+
+async def workflow_events(initial_state: dict, config: dict, stream_tokens: bool):
+    """
+    Exécuter le workflow en streaming
+    
+    Yields:
+        ("update", node_name, update) pour chaque mise à jour d'un node, et si stream_tokens
+        ("token", section_id, texte) pour chaque token LLM du contenu d'une section
+    """
+    from app.graph.workflow import SECTION_CONTENT_TAG
+    
+    if not stream_tokens:
+        async for output in workflow_app.astream(initial_state, config, stream_mode="updates"):
+            for node_name, update in output.items():
+                yield "update", node_name, update or {}
+        return
+    
+    # astream_events : les mises à jour des nodes arrivent en on_chain_stream du graph racine,
+    # les tokens en on_chat_model_stream des appels LLM tagués SECTION_CONTENT_TAG
+    root_run_id = None
+    async for event in workflow_app.astream_events(initial_state, config, version="v2"):
+        if root_run_id is None:
+            root_run_id = event["run_id"]
+        if event["event"] == "on_chain_stream" and event["run_id"] == root_run_id:
+            for node_name, update in event["data"]["chunk"].items():
+                yield "update", node_name, update or {}
+        elif event["event"] == "on_chat_model_stream" and SECTION_CONTENT_TAG in event.get("tags", []):
+            text = event["data"]["chunk"].content
+            if text:
+                yield "token", event["metadata"].get("section_id", ""), text
+
+
+
+
+def initial_workflow_state(request: ReportRequest) -> dict:
+    """État initial du workflow pour une requête"""
+    return {
+        "market_name": request.market_name,
+        "geography": request.geography,
+        "mission_type": request.mission_type,
+        "client_website": request.client_website,
+        "conversation_id": request.conversation_id,
+        "action": request.action,
+        "section_id": request.section_id,
+        "messages": [],
+        "current_step": None,
+        "current_section_index": None,
+        "total_sections": None,
+        "progress_percentage": None,
+        "step_details": None,
+        "estimated_time_remaining": None,
+        "start_time": None
+    }
+
+
+async def run_report(job: Job) -> dict:
+    """
+    Exécuter un job de rapport (worker de la file), ses appels OpenAI avec la priorité du job
+    
+    Returns:
+        Le rapport final {"sections", "expert_recommendations", "conversation_id", "cached"}
+    """
+    with llm_priority(job.priority):
+        return await _run_report(job)
+
+
+async def _run_report(job: Job) -> dict:
+    """Publier les événements SSE du workflow dans le job et renvoyer le rapport final"""
+    from app.graph.state import in_plan_order
+    
+    request = job.payload
+    initial_state = initial_workflow_state(request)
+    conversation_id = initial_state["conversation_id"]
+    
+    # Émettre événement initial
+    job.publish({"type": "start", "conversation_id": conversation_id, "job_id": job.id})
+    
+    # Serveur en cours de démarrage : attendre le workflow et l'index RAG
+    if not warmup_done.is_set():
+        job.publish({
+            "type": "progress",
+            "percentage": 0.0,
+            "step": "warmup",
+            "node": "warmup",
+            "details": {"message": "Initialisation du serveur (workflow et index RAG)..."}
+        })
+        await warmup_done.wait()
+    if workflow_app is None:
+        raise RuntimeError(readiness["error"] or "Workflow unavailable")
+    
+    # Rapport déjà généré pour ce marché : rejouer la progression depuis le cache
+    # (normalement servi avant la file par submit_report, sauf si le job attendait le warmup)
+    cached_report, index_version = await get_cached_report(request)
+    if cached_report is not None:
+        await restore_cached_report(request, conversation_id, cached_report)
+        for event in cached_report_events(cached_report, conversation_id):
+            job.publish(event)
+        return {**cached_report, "conversation_id": conversation_id, "cached": True}
+    
+    start_time = time.time()
+    last_progress = 0.0
+    total_sections = 14
+    section_order = {}
+    # Rapport reconstruit à partir des mises à jour des nodes (ID → section / recommandation)
+    sections_by_id = {}
+    recommendations_by_id = {}
+    generated_ids = set()
+    
+    # Approfondissement : repartir des sections déjà générées (checkpoint de la conversation)
+    config = thread_config(conversation_id)
+    if request.action == "deepen":
+        stored_state = await load_conversation_state(workflow_app, conversation_id) or {}
+        sections_by_id = {s.get("id", ""): s for s in stored_state.get("report_sections") or []}
+        recommendations_by_id = {r.get("section_id", ""): r for r in stored_state.get("expert_recommendations") or []}
+    
+    # Streamer les mises à jour du workflow (et le contenu des sections token par token)
+    # Chaque mise à jour ne contient que les clés modifiées par le node (ex: la seule section générée)
+    stream_tokens = Config.SSE_STREAM_TOKENS if request.stream_tokens is None else request.stream_tokens
+    streamed_content = {}  # ID de section → texte déjà envoyé en section_delta
+    deepened = False  # deepen_section exécuté : une seule section régénérée
+    async for kind, name, payload in workflow_events(initial_state, config, stream_tokens):
+        if kind == "token":
+            streamed_content[name] = streamed_content.get(name, "") + payload
+            # Non conservés après la fin du job : le rapport complet est rejoué par 'complete'
+            job.publish({
+                "type": "section_delta",
+                "section_id": name,
+                "delta": payload
+            }, transient=True)
+            continue
+        
+        node_name, update = name, payload
+        if node_name == "deepen_section":
+            deepened = True
+        elif node_name == "orchestrator":
+            # Génération complète (aussi pour un "deepen" sans checkpoint ou section exploitable)
+            sections_by_id, recommendations_by_id = {}, {}
+        new_sections = update.get("report_sections") or []
+        for section in new_sections:
+            sections_by_id[section.get("id", "")] = section
+            generated_ids.add(section.get("id", ""))
+        
+        if update.get("sections_to_process"):
+            section_order = {s: i for i, s in enumerate(update["sections_to_process"])}
+        
+        # Extraire les informations de progression de la mise à jour
+        # (absentes des workers parallèles : déduites des sections déjà générées)
+        total_sections = update.get("total_sections") or total_sections
+        current_step = update.get("current_step") or node_name
+        progress = update.get("progress_percentage")
+        if progress is None:
+            progress = min(1.0, len(generated_ids) / total_sections) if total_sections else 0.0
+        step_details = update.get("step_details") or {}
+        current_section_index = update.get("current_section_index", len(generated_ids))
+        
+        # Calculer le temps estimé
+        elapsed_time = time.time() - start_time
+        estimated_remaining = estimate_time_remaining(progress, elapsed_time)
+        
+        # Émettre événement de progression
+        if progress != last_progress or current_step:
+            job.publish({
+                "type": "progress",
+                "percentage": progress,
+                "step": current_step,
+                "node": node_name,
+                "details": step_details,
+                "section_index": current_section_index,
+                "total_sections": total_sections,
+                "estimated_time_remaining": estimated_remaining
+            })
+            last_progress = progress
+        
+        # Émettre événement pour chaque section générée (en mode parallèle les sections
+        # arrivent dans l'ordre de fin, section_index donne leur place dans le plan)
+        # On envoie seulement les métadonnées (titre, ID) pour la progression, pas le contenu complet
+        for section in new_sections:
+            job.publish({
+                "type": "section_complete",
+                "section": {
+                    "id": section.get("id", ""),
+                    "title": section.get("title", ""),
+                    "source": section.get("source", ""),
+                    "confidence_score": section.get("confidence_score", 0.0)
+                },
+                "section_index": section_order.get(section.get("id", ""))
+            })
+        
+        # Émettre chaque recommandation d'expert dès qu'elle est prête (générées en parallèle)
+        for recommendation in update.get("expert_recommendations") or []:
+            recommendations_by_id[recommendation.get("section_id", "")] = recommendation
+            job.publish({
+                "type": "expert_recommendation",
+                "recommendation": recommendation
+            })
+    
+    final_state = {
+        "report_sections": in_plan_order(list(sections_by_id.values())),
+        "expert_recommendations": in_plan_order(list(recommendations_by_id.values()), "section_id")
+    }
+    if not deepened:
+        await store_report(request, index_version, final_state)
+    
+    # Le contenu déjà reçu en section_delta n'est pas renvoyé (content_streamed)
+    complete_sections = []
+    for section in final_state["report_sections"]:
+        if streamed_content.get(section.get("id", "")) == section.get("content"):
+            section = {k: v for k, v in section.items() if k != "content"}
+            section["content_streamed"] = True
+        complete_sections.append(section)
+    
+    # Émettre événement final avec toutes les sections et recommandations
+    # (avec leur contenu pour les abonnés arrivés après la fin du job, sans les section_delta)
+    complete_event = {
+        "type": "complete",
+        "sections": complete_sections,
+        "expert_recommendations": final_state["expert_recommendations"],
+        "conversation_id": conversation_id
+    }
+    job.publish(complete_event, replay={**complete_event, "sections": final_state["report_sections"]})
+    return {
+        "sections": final_state["report_sections"],
+        "expert_recommendations": final_state["expert_recommendations"],
+        "conversation_id": conversation_id,
+        "cached": False
+    }
+
+
+# File de jobs de rapports : au plus JOB_WORKERS workflows en parallèle, JOB_QUEUE_MAX_DEPTH en attente
+report_jobs = JobQueue(run_report, Config.JOB_WORKERS, Config.JOB_QUEUE_MAX_DEPTH, Config.JOB_RESULT_TTL)
+
+
+def _coalescing_key(request: ReportRequest) -> str:
+    """Clé de coalescence : champs normalisés de la requête (conversation prise en compte seulement pour "deepen")"""
+    conversation_id = request.conversation_id if request.action == "deepen" else ""
+    return cache_key(
+        request.market_name, request.geography, request.mission_type, request.client_website,
+        request.action, request.section_id, conversation_id
+    )
+
+
+# Profondeur des files (lue à chaque collecte de /metrics)
+REGISTRY.callback(
+    "kpmg_job_queue_jobs", "Report jobs by state (queued, running)", "gauge", ["state"],
+    lambda: {("queued",): report_jobs.depth, ("running",): report_jobs.running}
+)
+REGISTRY.callback(
+    "kpmg_llm_scheduler_queue_depth", "OpenAI calls waiting for rate limit admission", "gauge", ["priority"],
+    lambda: {(name,): count for name, count in get_scheduler().stats()["waiting"].items()}
+)
+
+
+async def serve_cached_report(request: ReportRequest, priority: int):
+    """
+    Job déjà terminé servant le rapport en cache de la requête, sans passer par la file
+    (ni worker ni place dans JOB_QUEUE_MAX_DEPTH)
+    
+    Returns:
+        Le job, ou None si le rapport n'est pas en cache
+    """
+    cached_report, _ = await get_cached_report(request)
+    if cached_report is None:
+        return None
+    conversation_id = request.conversation_id
+    await restore_cached_report(request, conversation_id, cached_report)
+    job = report_jobs.record(request, priority)
+    job.publish({"type": "start", "conversation_id": conversation_id, "job_id": job.id})
+    for event in cached_report_events(cached_report, conversation_id):
+        job.publish(event)
+    report_jobs.complete(job, {**cached_report, "conversation_id": conversation_id, "cached": True})
+    return job
+
+
+async def submit_report(request: ReportRequest, priority: int = PRIORITY_BATCH) -> Job:
+    """
+    Servir le rapport depuis le cache, sinon mettre sa génération dans la file, ou rattacher
+    la requête au job identique déjà en attente ou en cours (single-flight)
+    
+    Args:
+        request: Requête de rapport
+        priority: PRIORITY_INTERACTIVE (streaming) passe avant PRIORITY_BATCH, dans la file
+            comme pour les appels OpenAI
+    
+    Raises:
+        HTTPException 503 si la file est pleine
+    """
+    if not request.conversation_id:
+        request.conversation_id = f"conv-{uuid.uuid4()}"
+    # Le rapport servi depuis le cache est écrit dans le checkpoint : il faut le workflow compilé
+    if workflow_app is not None:
+        job = await serve_cached_report(request, priority)
+        if job is not None:
+            return job
+    key = None
+    if Config.REQUEST_COALESCING_ENABLED:
+        key = _coalescing_key(request)
+        job = report_jobs.find(key)
+        # Une requête force_refresh ne se rattache qu'à une génération elle-même forcée
+        if job is not None and (job.payload.force_refresh or not request.force_refresh):
+            job.coalesced += 1
+            COALESCED_REQUESTS.inc()
+            return job
+    try:
+        job = report_jobs.submit(request, key, priority)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    job.publish({"type": "queued", "job_id": job.id, "position": report_jobs.position(job)})
+    return job
+
+
+async def follow_report(job: Job, request: ReportRequest):
+    """
+    Événements du job d'une requête ; une requête coalescée reçoit le rapport
+    sous sa propre conversation (checkpointée pour "deepen")
+    """
+    conversation_id = request.conversation_id
+    shared = job.payload.conversation_id != conversation_id
+    async for event in job.subscribe():
+        if shared and "conversation_id" in event:
+            if event["type"] == "complete":
+                report = await job.wait()
+                if report is not None:
+                    await restore_cached_report(request, conversation_id, report)
+            event = {**event, "conversation_id": conversation_id}
+        yield event
+
+
+def job_response(job: Job) -> JobResponse:
+    """Statut d'un job pour l'API"""
+    return JobResponse(
+        **job.to_dict(),
+        conversation_id=job.payload.conversation_id,
+        position=report_jobs.position(job)
+    )
+
+
+def get_job_or_404(job_id: str) -> Job:
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+
+def sse_response(events) -> StreamingResponse:
+    """Réponse SSE à partir d'un itérateur async d'événements"""
     async def event_generator():
-        try:
-            # Créer l'état initial
-            initial_state = {
-                "market_name": request.market_name,
-                "geography": request.geography,
-                "mission_type": request.mission_type,
-                "client_website": request.client_website,
-                "conversation_id": request.conversation_id or f"conv-{uuid.uuid4()}",
-                "action": request.action,
-                "section_id": request.section_id,
-                "messages": [],
-                "current_step": None,
-                "current_section_index": None,
-                "total_sections": None,
-                "progress_percentage": None,
-                "step_details": None,
-                "estimated_time_remaining": None,
-                "start_time": None
-            }
-            
-            # Émettre événement initial
-            yield f"data: {json.dumps({'type': 'start', 'conversation_id': initial_state['conversation_id']})}\n\n"
-            
-            start_time = time.time()
-            last_progress = 0.0
-            last_section_count = 0
-            final_state = initial_state
-            
-            # Streamer les états du workflow
-            # astream() retourne un dict {node_name: state} à chaque étape
-            async for output in workflow_app.astream(initial_state):
-                # output est un dict {node_name: state}
-                # On itère sur tous les nœuds qui ont été exécutés
-                for node_name, state in output.items():
-                    # Extraire les informations de progression depuis le state
-                    current_step = state.get("current_step")
-                    progress = state.get("progress_percentage", 0.0)
-                    step_details = state.get("step_details", {})
-                    current_section_index = state.get("current_section_index", 0)
-                    total_sections = state.get("total_sections", 14)
-                    report_sections = state.get("report_sections", [])
-                    
-                    # Mettre à jour l'état final
-                    final_state = state
-                    
-                    # Calculer le temps estimé
-                    elapsed_time = time.time() - start_time
-                    estimated_remaining = estimate_time_remaining(progress, elapsed_time)
-                    
-                    # Émettre événement de progression
-                    if progress != last_progress or current_step:
-                        yield f"data: {json.dumps({
-                            'type': 'progress',
-                            'percentage': progress,
-                            'step': current_step,
-                            'node': node_name,
-                            'details': step_details,
-                            'section_index': current_section_index,
-                            'total_sections': total_sections,
-                            'estimated_time_remaining': estimated_remaining
-                        })}\n\n"
-                        last_progress = progress
-                    
-                    # Émettre événement si une nouvelle section est complétée
-                    # On envoie seulement les métadonnées (titre, ID) pour la progression, pas le contenu complet
-                    if len(report_sections) > last_section_count:
-                        # Nouvelles sections ajoutées
-                        new_sections = report_sections[last_section_count:]
-                        for section in new_sections:
-                            # Envoyer seulement les métadonnées pour la progression
-                            section_info = {
-                                "id": section.get("id", ""),
-                                "title": section.get("title", ""),
-                                "source": section.get("source", ""),
-                                "confidence_score": section.get("confidence_score", 0.0)
-                            }
-                            yield f"data: {json.dumps({
-                                'type': 'section_complete',
-                                'section': section_info
-                            })}\n\n"
-                        last_section_count = len(report_sections)
-            
-            # Émettre événement final avec toutes les sections et recommandations
-            yield f"data: {json.dumps({
-                'type': 'complete',
-                'sections': final_state.get('report_sections', []),
-                'expert_recommendations': final_state.get('expert_recommendations', []),
-                'conversation_id': final_state.get('conversation_id', initial_state['conversation_id'])
-            })}\n\n"
-            
-        except Exception as e:
-            # Émettre événement d'erreur
-            yield f"data: {json.dumps({
-                'type': 'error',
-                'message': str(e)
-            })}\n\n"
+        with SSE_STREAM_DURATION.time():
+            async for event in events:
+                yield f"data: {json.dumps(event)}\n\n"
     
     return StreamingResponse(
         event_generator(),
@@ -175,45 +642,89 @@ async def generate_report_stream(request: ReportRequest):
     )
 
 
+@app.post("/api/generate-report-stream")
+async def generate_report_stream(request: ReportRequest):
+    """
+    Génère un rapport avec streaming en temps réel via SSE
+    (exécuté par la file de jobs : le flux commence par un événement 'queued')
+    """
+    return sse_response(follow_report(await submit_report(request, PRIORITY_INTERACTIVE), request))
+
+
 @app.post("/api/generate-report", response_model=ReportResponse)
 async def generate_report(request: ReportRequest):
     """
     Génère un rapport complet d'étude de marché (sans streaming)
     """
-    try:
-        # Créer l'état initial
-        initial_state = {
-            "market_name": request.market_name,
-            "geography": request.geography,
-            "mission_type": request.mission_type,
-            "client_website": request.client_website,
-            "conversation_id": request.conversation_id or f"conv-{uuid.uuid4()}",
-            "action": request.action,
-            "section_id": request.section_id,
-            "messages": [],
-            "current_step": None,
-            "current_section_index": None,
-            "total_sections": None,
-            "progress_percentage": None,
-            "step_details": None,
-            "estimated_time_remaining": None,
-            "start_time": None
-        }
-        
-        # Exécuter le workflow
-        final_state = await workflow_app.ainvoke(initial_state)
-        
-        return ReportResponse(
-            sections=final_state.get("report_sections", []),
-            expert_recommendations=final_state.get("expert_recommendations", []),
-            conversation_id=final_state.get("conversation_id", initial_state["conversation_id"])
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Pas de section_delta : personne ne suit les événements du job
+    request.stream_tokens = False
+    job = await submit_report(request)
+    report = await job.wait()
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    # Requête coalescée : le rapport partagé est rattaché à la conversation de la requête
+    if job.payload.conversation_id != request.conversation_id:
+        await restore_cached_report(request, request.conversation_id, report)
+        report = {**report, "conversation_id": request.conversation_id}
+    return ReportResponse(**report)
+
+
+@app.post("/api/jobs", response_model=JobResponse, status_code=202)
+async def create_job(request: ReportRequest):
+    """
+    Met une génération de rapport dans la file et renvoie immédiatement l'ID du job
+    """
+    return job_response(await submit_report(request))
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Statut d'un job (queued, running, completed, failed) et position dans la file"""
+    return job_response(get_job_or_404(job_id))
+
+
+@app.get("/api/jobs/{job_id}/result", response_model=ReportResponse)
+async def get_job_result(job_id: str):
+    """Rapport d'un job terminé (409 tant qu'il est en cours)"""
+    job = get_job_or_404(job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if not job.done:
+        raise HTTPException(status_code=409, detail=f"Job {job.status}")
+    return ReportResponse(**job.result)
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Flux SSE des événements d'un job (rejoue les événements déjà émis)"""
+    return sse_response(get_job_or_404(job_id).subscribe())
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness endpoint: 200 once the workflow is compiled and the RAG index opened, 503 while warming up"""
+    content = {"ready": warmup_done.is_set() and workflow_app is not None, **readiness}
+    if not content["ready"]:
+        return JSONResponse(status_code=503, content=content)
+    return content
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (text exposition format)"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/health")
 async def health():
     """Health check endpoint"""
-    return {"status": "ok", "version": "1.0.0"}
+    return {
+        "status": "ok",
+        "version": "1.0.0",
+        "jobs": report_jobs.stats(),
+        "llm_scheduler": get_scheduler().stats()
+    }
+
+
+# Durée d'import de ce module (rapportée au démarrage et par /ready)
+readiness["import_seconds"] = round(time.perf_counter() - _import_started, 3)
@@ -12,6 +12,8 @@ class ReportRequest(BaseModel):
     conversation_id: Optional[str] = None
     action: Optional[str] = "generate"
     section_id: Optional[str] = None
+    force_refresh: bool = False  # Ignorer le cache de rapports
+    stream_tokens: Optional[bool] = None  # Streaming SSE du contenu token par token (défaut : Config.SSE_STREAM_TOKENS)
 
 
 class ReportResponse(BaseModel):
@@ -19,3 +21,19 @@ class ReportResponse(BaseModel):
     sections: list
     expert_recommendations: list
     conversation_id: str
+    cached: bool = False
+
+
+class JobResponse(BaseModel):
+    """Status of a queued report generation job"""
+    job_id: str
+    status: str  # queued, running, completed, failed
+    priority: int = 1  # 0 interactif (streaming), 1 batch
+    conversation_id: str
+    position: int = 0  # Jobs en attente devant celui-ci
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    events: int = 0
+    coalesced: int = 0  # Requêtes identiques rattachées à ce job
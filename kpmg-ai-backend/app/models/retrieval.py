@@ -0,0 +1,95 @@
+"""Retrieval result models for the internal knowledge base"""
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+
+def _scores(chunk: "RetrievedChunk") -> str:
+    """Scores of a chunk for the [Source: ...] headers (dense and/or lexical)"""
+    parts = []
+    if chunk.similarity is not None:
+        parts.append(f"Similarity: {chunk.similarity:.2f} | Distance: {chunk.distance:.3f}")
+    if chunk.lexical_score is not None:
+        parts.append(f"Lexical: {chunk.lexical_score:.2f}")
+    return " | ".join(parts)
+
+
+class RetrievedChunk(BaseModel):
+    """
+    A chunk returned by the internal search
+    
+    distance / similarity come from the dense (embedding) search and are None for chunks found
+    by the lexical index only; lexical_score is the share of query terms the chunk contains
+    (BM25 side of hybrid search), not a cosine similarity
+    """
+    content: str
+    distance: Optional[float] = None
+    similarity: Optional[float] = None
+    lexical_score: Optional[float] = None
+    source_file: str = "Unknown"
+    file_name: str = "Unknown"
+    file_type: Optional[str] = None
+
+
+class RetrievalResult(BaseModel):
+    """Result of an internal search for one query"""
+    query: str
+    chunks: List[RetrievedChunk] = []
+    message: Optional[str] = None  # Raison de l'absence de résultats (aucun document, erreur...)
+    
+    @property
+    def has_results(self) -> bool:
+        return bool(self.chunks)
+    
+    @property
+    def best_similarity(self) -> float:
+        """Best dense similarity (0.0 if no chunk was scored by the dense search)"""
+        return max((chunk.similarity for chunk in self.chunks if chunk.similarity is not None), default=0.0)
+    
+    @property
+    def best_lexical_score(self) -> float:
+        """Best query term coverage of the lexical search"""
+        return max((chunk.lexical_score for chunk in self.chunks if chunk.lexical_score is not None), default=0.0)
+    
+    def chunks_by_file(self) -> Dict[str, List[RetrievedChunk]]:
+        """Chunks grouped by source file, without duplicate contents"""
+        by_file: Dict[str, List[RetrievedChunk]] = {}
+        seen_content = set()
+        for chunk in self.chunks:
+            # Normaliser le contenu pour détecter les doublons
+            content_normalized = ' '.join(chunk.content.split())
+            if content_normalized in seen_content:
+                continue
+            seen_content.add(content_normalized)
+            by_file.setdefault(chunk.file_name, []).append(chunk)
+        return by_file
+    
+    def context_text(self) -> str:
+        """
+        Consolidated content for downstream nodes: a single [Source: ...] header
+        (best file) followed by the unique contents of all files.
+        """
+        if not self.chunks:
+            return ""
+        # Les chunks sont classés par pertinence (dense, ou fusion dense + lexicale)
+        best = self.chunks[0]
+        contents = [chunk.content for chunks in self.chunks_by_file().values() for chunk in chunks]
+        header = f"[Source: {best.file_name} | {_scores(best)}]"
+        return header + "\n" + '\n\n'.join(contents)
+    
+    def render(self) -> str:
+        """
+        Text rendering used by the LangChain tool: results grouped by source file,
+        prefixed with [BEST_SIMILARITY: ...]
+        """
+        if not self.chunks:
+            return self.message or "Aucune information trouvée dans la base interne KPMG."
+        
+        formatted_results = []
+        for file_name, file_chunks in self.chunks_by_file().items():
+            # Chunks classés par pertinence : le premier est le meilleur match du fichier
+            best = file_chunks[0]
+            consolidated_content = '\n\n'.join(chunk.content for chunk in file_chunks)
+            formatted_results.append(f"[Source: {file_name} | {_scores(best)}]\n{consolidated_content}")
+        
+        result_text = "\n\n---\n\n".join(formatted_results)
+        return f"[BEST_SIMILARITY: {self.best_similarity:.3f}]\n{result_text}"
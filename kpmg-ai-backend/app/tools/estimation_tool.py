@@ -1,30 +1,14 @@
 """Estimation Tool for market data estimation"""
-from langchain.tools import tool
-from langchain_openai import ChatOpenAI
+from langchain.tools import StructuredTool
 from langchain.prompts import ChatPromptTemplate
 from app.config import Config
+from app.utils.llm import get_llm
+from app.utils.metrics import timed, TOOL_DURATION
 
 
-@tool
-def estimate_market_data(context: str, variables: str) -> str:
-    """
-    Génère des estimations de marché via agent ML.
-    
-    Args:
-        context: Contexte du marché (nom, géographie, segmentation)
-        variables: Variables à estimer (SAM, SOM, etc.)
-        
-    Returns:
-        Estimations avec hypothèses et scores de confiance
-    """
-    if not Config.OPENAI_API_KEY:
-        return "Configuration OpenAI manquante."
-    
-    llm = ChatOpenAI(
-        model=Config.OPENAI_MODEL,
-        temperature=0.3,
-        api_key=Config.OPENAI_API_KEY
-    )
+def _build_chain(context: str, variables: str):
+    """Chaîne prompt | LLM d'estimation pour un contexte et des variables donnés"""
+    llm = get_llm(temperature=0.3)
     
     # Déterminer le type d'estimation demandé
     is_sizing = any(kw in variables.lower() for kw in ['tam', 'sam', 'som', 'taille', 'sizing'])
@@ -126,9 +110,47 @@ Approche méthodologique :
         ("user", user_msg)
     ])
     
+    return prompt | llm
+
+
+@timed(TOOL_DURATION, tool="estimate_market_data")
+def _estimate(context: str, variables: str) -> str:
+    """
+    Génère des estimations de marché via agent ML.
+    
+    Args:
+        context: Contexte du marché (nom, géographie, segmentation)
+        variables: Variables à estimer (SAM, SOM, etc.)
+        
+    Returns:
+        Estimations avec hypothèses et scores de confiance
+    """
+    if not Config.OPENAI_API_KEY:
+        return "Configuration OpenAI manquante."
+    
     try:
-        chain = prompt | llm
-        result = chain.invoke({})
+        result = _build_chain(context, variables).invoke({})
         return result.content
     except Exception as e:
         return f"Erreur lors de l'estimation: {str(e)}"
+
+
+@timed(TOOL_DURATION, tool="estimate_market_data")
+async def _aestimate(context: str, variables: str) -> str:
+    """Version async de _estimate (ainvoke), utilisée par estimate_market_data.ainvoke()"""
+    if not Config.OPENAI_API_KEY:
+        return "Configuration OpenAI manquante."
+    
+    try:
+        result = await _build_chain(context, variables).ainvoke({})
+        return result.content
+    except Exception as e:
+        return f"Erreur lors de l'estimation: {str(e)}"
+
+
+# Outil LangChain : .invoke() synchrone, .ainvoke() non bloquant pour la boucle d'événements
+estimate_market_data = StructuredTool.from_function(
+    func=_estimate,
+    coroutine=_aestimate,
+    name="estimate_market_data"
+)
@@ -3,8 +3,8 @@ from langchain.tools import tool
 from langchain_community.document_loaders import GoogleDocsLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
 from app.config import Config
+from app.utils.embeddings import get_embeddings
 import os
 
 
@@ -32,7 +32,7 @@ def _get_vectorstore():
         splits = text_splitter.split_documents(docs)
         
         # Vector store
-        embeddings = OpenAIEmbeddings(api_key=Config.OPENAI_API_KEY)
+        embeddings = get_embeddings()
         vectorstore = Chroma.from_documents(
             documents=splits,
             embedding=embeddings,
@@ -1,57 +1,100 @@
 """Linkup Web Search Tool for web research"""
-from langchain.tools import tool
+from langchain.tools import StructuredTool
 import httpx
 from app.config import Config
+from app.utils.llm import get_http_client, get_async_http_client
+from app.utils.metrics import timed, TOOL_DURATION
 
 
-@tool
-def linkup_web_search(query: str) -> str:
+def _build_request(query: str, depth: str) -> tuple:
+    """Headers and payload of a Linkup search request"""
+    headers = {
+        "Authorization": f"Bearer {Config.LINKUP_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    
+    payload = {
+        "q": query,
+        "depth": depth,
+        "outputType": "searchResults",
+        "includeImages": False
+    }
+    return headers, payload
+
+
+def _format_results(data: dict) -> str:
+    """Format the top results of a Linkup response"""
+    if "results" in data and data["results"]:
+        formatted = []
+        for result in data["results"][:5]:  # Top 5
+            title = result.get('title', 'N/A')
+            snippet = result.get('snippet', result.get('description', ''))
+            formatted.append(f"Source: {title}\n{snippet}")
+        return "\n\n---\n\n".join(formatted)
+    else:
+        return "Aucun résultat trouvé via recherche web."
+
+
+@timed(TOOL_DURATION, tool="linkup_web_search")
+def _search(query: str, depth: str = "standard") -> str:
     """
     Effectue une recherche web approfondie via Linkup API.
     
     Args:
         query: Requête de recherche détaillée et spécifique
-        
+        depth: Profondeur Linkup ("standard" ou "deep")
+    
     Returns:
         Résultats de recherche formatés
     """
     if not Config.LINKUP_API_KEY:
         return "Configuration Linkup API manquante."
     
-    headers = {
-        "Authorization": f"Bearer {Config.LINKUP_API_KEY}",
-        "Content-Type": "application/json"
-    }
+    headers, payload = _build_request(query, depth)
     
-    payload = {
-        "q": query,
-        "depth": "standard",
-        "outputType": "searchResults",
-        "includeImages": False
-    }
+    try:
+        response = get_http_client().post(
+            Config.LINKUP_API_URL,
+            json=payload,
+            headers=headers,
+            timeout=30.0
+        )
+        response.raise_for_status()
+        return _format_results(response.json())
+    
+    except httpx.HTTPError as e:
+        return f"Erreur HTTP lors de la recherche web: {str(e)}"
+    except Exception as e:
+        return f"Erreur lors de la recherche web: {str(e)}"
+
+
+@timed(TOOL_DURATION, tool="linkup_web_search")
+async def _asearch(query: str, depth: str = "standard") -> str:
+    """Version async de _search (client async partagé), utilisée par linkup_web_search.ainvoke()"""
+    if not Config.LINKUP_API_KEY:
+        return "Configuration Linkup API manquante."
+    
+    headers, payload = _build_request(query, depth)
     
     try:
-        response = httpx.post(
+        response = await get_async_http_client().post(
             Config.LINKUP_API_URL,
             json=payload,
             headers=headers,
             timeout=30.0
         )
         response.raise_for_status()
-        data = response.json()
-        
-        # Formater les résultats
-        if "results" in data and data["results"]:
-            formatted = []
-            for result in data["results"][:5]:  # Top 5
-                title = result.get('title', 'N/A')
-                snippet = result.get('snippet', result.get('description', ''))
-                formatted.append(f"Source: {title}\n{snippet}")
-            return "\n\n---\n\n".join(formatted)
-        else:
-            return "Aucun résultat trouvé via recherche web."
-            
+        return _format_results(response.json())
+    
     except httpx.HTTPError as e:
         return f"Erreur HTTP lors de la recherche web: {str(e)}"
     except Exception as e:
         return f"Erreur lors de la recherche web: {str(e)}"
+
+
+# Outil LangChain : .invoke() et .ainvoke() réutilisent les pools de connexions partagés
+linkup_web_search = StructuredTool.from_function(
+    func=_search,
+    coroutine=_asearch,
+    name="linkup_web_search"
+)
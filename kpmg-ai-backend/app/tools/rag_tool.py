@@ -10,28 +10,105 @@ from langchain_community.document_loaders import (
     UnstructuredWordDocumentLoader
 )
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
 from app.config import Config
+from app.utils.embeddings import get_embeddings, get_embedding_signature
+from app.utils.lru_cache import LRUTTLCache
+from app.utils.bm25 import BM25Index, query_coverage
+from app.models.retrieval import RetrievalResult, RetrievedChunk
+from app.utils.concurrency import run_blocking
+from app.utils.rate_limit import llm_priority, PRIORITY_INDEXING
+from app.utils.metrics import timed, register_cache, TOOL_DURATION, CHROMA_QUERY_DURATION
+from multiprocessing.connection import wait as wait_connections
+import multiprocessing
 import hashlib
 import json
+import threading
+import time
 from pathlib import Path
 
 
 # Cache pour le vectorstore
 _vectorstore_cache = None
+_last_change_check = float("-inf")  # Dernier scan du dossier (avec ou sans documents trouvés)
+# Un seul thread vérifie / ré-indexe à la fois (réentrant : le chargement BM25 le reprend)
+_index_lock = threading.RLock()
+
+# Version de l'index (hash du contenu indexé) : invalide le cache des recherches à chaque ré-indexation
+_index_version = None
+_search_results_cache = LRUTTLCache(Config.RAG_QUERY_CACHE_SIZE, Config.RAG_QUERY_CACHE_TTL)
+register_cache("rag_search", _search_results_cache)
+
+# Index lexical BM25 (recherche hybride), persisté à côté de la collection ChromaDB
+# Jamais modifié en place : la ré-indexation travaille sur une copie, remplacée une fois prête
+_lexical_index = None
+_lexical_index_file = os.path.join(Config.CHROMA_PERSIST_DIRECTORY, "bm25_index.json")
+
+# Backend/modèle d'embedding qui a construit l'index
+_index_info_file = os.path.join(Config.CHROMA_PERSIST_DIRECTORY, "index_info.json")
 _index_metadata_file = "data/chroma_db/index_metadata.json"
 
+# Supported file types
+_FILE_LOADERS = {
+    '.pdf': PyPDFLoader,
+    '.txt': TextLoader,
+    '.md': TextLoader,
+    '.docx': UnstructuredWordDocumentLoader,
+}
+
+# Files to exclude from indexing (documentation, config files, etc.)
+_EXCLUDED_FILES = {
+    'readme.md', 'readme.txt', '.gitkeep', '.gitignore',
+    'license', 'license.txt', 'changelog', 'changelog.txt',
+    '.gitkeep.bak', 'readme_documents.md'
+}
+
+# File extensions to exclude (even if they match supported types)
+_EXCLUDED_EXTENSIONS = {'.gitkeep', '.gitignore', '.bak'}
+
+# Taille des blocs lus pour le hash (évite de charger un PDF entier en mémoire)
+_HASH_CHUNK_SIZE = 1024 * 1024
+
 
 def _get_document_hash(file_path: str) -> str:
-    """Calculate hash of file for change detection"""
+    """Calculate hash of file for change detection (streamed in chunks)"""
     try:
+        file_hash = hashlib.md5()
         with open(file_path, 'rb') as f:
-            return hashlib.md5(f.read()).hexdigest()
+            for block in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
     except Exception:
         return ""
 
 
+def _get_file_stat(file_path: str) -> dict:
+    """Cheap file signature (size, mtime_ns, inode) used before falling back to a hash"""
+    try:
+        stat = os.stat(file_path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "inode": stat.st_ino}
+    except OSError:
+        return {}
+
+
+def _entry_hash(entry) -> str:
+    """Hash stored in a manifest entry (older manifests stored the bare hash)"""
+    if isinstance(entry, dict):
+        return entry.get("hash", "")
+    return entry or ""
+
+
+def _is_changed(previous, entry) -> bool:
+    """
+    True if a file must be (re)loaded: its content hash changed, or its last load failed
+    and the file was modified since (a failed entry is only kept while its stat is unchanged)
+    """
+    if _entry_hash(previous) != _entry_hash(entry):
+        return True
+    return isinstance(previous, dict) and previous.get("failed", False) and not entry.get("failed", False)
+
+
 def _load_index_metadata() -> dict:
     """Load index metadata to track indexed files"""
     if os.path.exists(_index_metadata_file):
@@ -53,37 +130,19 @@ def _save_index_metadata(metadata: dict):
         print(f"Error saving metadata: {e}")
 
 
-def _load_documents_from_directory(directory: str = None) -> list:
+def _list_document_files(directory: str = None) -> list:
     """
-    Load all documents from a directory (PDF, TXT, DOCX, MD, etc.)
+    List indexable files in a directory (supported extensions, excluded files skipped)
     """
     if directory is None:
         directory = Config.DOCUMENTS_DIRECTORY
     
-    documents = []
+    files = []
     directory_path = Path(directory)
     
     if not directory_path.exists():
         print(f"Directory {directory} does not exist")
-        return documents
-    
-    # Supported file types
-    file_extensions = {
-        '.pdf': PyPDFLoader,
-        '.txt': TextLoader,
-        '.md': TextLoader,
-        '.docx': UnstructuredWordDocumentLoader,
-    }
-    
-    # Files to exclude from indexing (documentation, config files, etc.)
-    excluded_files = {
-        'readme.md', 'readme.txt', '.gitkeep', '.gitignore',
-        'license', 'license.txt', 'changelog', 'changelog.txt',
-        '.gitkeep.bak', 'readme_documents.md'
-    }
-    
-    # File extensions to exclude (even if they match supported types)
-    excluded_extensions = {'.gitkeep', '.gitignore', '.bak'}
+        return files
     
     for file_path in directory_path.rglob('*'):
         # Skip directories
@@ -91,92 +150,490 @@ def _load_documents_from_directory(directory: str = None) -> list:
             continue
         
         # Skip if extension is excluded
-        if file_path.suffix.lower() in excluded_extensions:
+        if file_path.suffix.lower() in _EXCLUDED_EXTENSIONS:
             continue
         
         # Skip if file name matches excluded patterns
         file_name_lower = file_path.name.lower()
-        if any(excluded in file_name_lower for excluded in excluded_files):
-            print(f"⊘ Skipping {file_path.name} (excluded file)")
+        if any(excluded in file_name_lower for excluded in _EXCLUDED_FILES):
             continue
         
-        if file_path.is_file() and file_path.suffix.lower() in file_extensions:
-            try:
-                loader_class = file_extensions[file_path.suffix.lower()]
-                loader = loader_class(str(file_path))
-                docs = loader.load()
-                
-                # Add metadata about source file
-                for doc in docs:
-                    doc.metadata['source_file'] = str(file_path)
-                    doc.metadata['file_type'] = file_path.suffix
-                    doc.metadata['file_name'] = file_path.name
-                
-                documents.extend(docs)
-                print(f"✓ Loaded {file_path.name} ({len(docs)} chunks)")
-            except Exception as e:
-                print(f"✗ Error loading {file_path}: {e}")
-                continue
+        if file_path.suffix.lower() in _FILE_LOADERS:
+            files.append(file_path)
+    
+    return sorted(files)
+
+
+def _load_document_file(file_path: Path):
+    """
+    Load a single document file. Returns None if the file could not be loaded.
+    """
+    try:
+        loader_class = _FILE_LOADERS[file_path.suffix.lower()]
+        loader = loader_class(str(file_path))
+        docs = loader.load()
+        
+        # Add metadata about source file
+        for doc in docs:
+            doc.metadata['source_file'] = str(file_path)
+            doc.metadata['file_type'] = file_path.suffix
+            doc.metadata['file_name'] = file_path.name
+        
+        print(f"✓ Loaded {file_path.name} ({len(docs)} chunks)")
+        return docs
+    except Exception as e:
+        print(f"✗ Error loading {file_path}: {e}")
+        return None
+
+
+def _load_file_worker(file_path: Path, connection):
+    """Loader process: send the documents of one file (or None) to the parent"""
+    connection.send(_load_document_file(file_path))
+    connection.close()
+
+
+def _loader_context():
+    """
+    Start method of the loader processes. Never fork: the server process runs threads
+    (run_blocking, httpx, ChromaDB) whose locks would be copied in an inconsistent state.
+    forkserver (loaders preloaded once) where available, spawn otherwise.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _load_files(file_paths: list) -> dict:
+    """
+    Load files in loader processes, at most RAG_LOADER_WORKERS at once (a single changed
+    file too), so every file is bounded by RAG_LOADER_TIMEOUT: a process exceeding it is
+    killed and the file counted as failed.
+    Returns {file_path: documents or None if loading failed}.
+    """
+    context = _loader_context()
+    workers = max(1, min(Config.RAG_LOADER_WORKERS, len(file_paths)))
+    timeout = Config.RAG_LOADER_TIMEOUT
+    results = {}
+    pending = [Path(file_path) for file_path in file_paths]
+    in_flight = {}  # Connexion → (fichier, process, début du chargement)
+    
+    try:
+        while pending or in_flight:
+            while pending and len(in_flight) < workers:
+                file_path = pending.pop(0)
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=_load_file_worker, args=(file_path, sender), daemon=True)
+                process.start()
+                sender.close()
+                in_flight[receiver] = (file_path, process, time.monotonic())
+            
+            now = time.monotonic()
+            wait_timeout = max(0.0, min(timeout - (now - started) for _, _, started in in_flight.values()))
+            for receiver in wait_connections(list(in_flight), timeout=wait_timeout):
+                file_path, process, started = in_flight.pop(receiver)
+                try:
+                    results[str(file_path)] = receiver.recv()
+                except (EOFError, OSError):
+                    # Process mort sans résultat (crash du parser)
+                    print(f"✗ Error loading {file_path}: loader process exited")
+                    results[str(file_path)] = None
+                receiver.close()
+                # Un process qui a envoyé ses documents mais ne se termine pas (atexit, threads
+                # non daemon) est tué à l'échéance de son timeout
+                process.join(max(0.0, timeout - (time.monotonic() - started)))
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+            
+            now = time.monotonic()
+            for receiver, (file_path, process, started) in list(in_flight.items()):
+                if now - started >= timeout:
+                    del in_flight[receiver]
+                    process.kill()
+                    process.join()
+                    receiver.close()
+                    print(f"✗ Timeout loading {file_path} (> {timeout:.0f}s)")
+                    results[str(file_path)] = None
+    finally:
+        for receiver, (_, process, _) in in_flight.items():
+            process.kill()
+            process.join()
+            receiver.close()
+    
+    return results
+
+
+def _load_index_info() -> dict:
+    """Load the embedding backend/model recorded when the index was built"""
+    if os.path.exists(_index_info_file):
+        try:
+            with open(_index_info_file, 'r') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+    return {}
+
+
+def _save_index_info():
+    """Record the embedding backend/model that built the index"""
+    os.makedirs(os.path.dirname(_index_info_file), exist_ok=True)
+    try:
+        with open(_index_info_file, 'w') as f:
+            json.dump(get_embedding_signature(), f, indent=2)
+    except Exception as e:
+        print(f"Error saving index info: {e}")
+
+
+def _compute_index_version(metadata: dict) -> str:
+    """Version of the index: hash of the embedding backend and of the indexed files' content hashes"""
+    indexed = sorted(
+        (file_str, _entry_hash(entry)) for file_str, entry in metadata.items()
+        if not (isinstance(entry, dict) and entry.get("failed"))
+    )
+    signature = get_embedding_signature()
+    return hashlib.md5(json.dumps([signature, indexed], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _set_index_version(metadata: dict):
+    """Record the current index version, dropping cached search results if it changed"""
+    global _index_version
+    version = _compute_index_version(metadata)
+    if version != _index_version:
+        _search_results_cache.clear()
+        _index_version = version
+
+
+def get_index_version() -> str:
+    """Current index version (changes whenever the indexed documents change)"""
+    if _index_version is None:
+        _set_index_version(_load_index_metadata())
+    return _index_version
+
+
+def _normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups (case and whitespace)"""
+    return " ".join(query.lower().split())
+
+
+def _similarity_search_batch(vectorstore, queries: list, k: int) -> list:
+    """
+    Multi-query similarity search with an LRU+TTL cache keyed by (index version, query, k).
+    Uncached queries are embedded in one request and sent to ChromaDB in one query.
+    
+    Returns a list of [(document, distance)] per query.
+    """
+    version = get_index_version()
+    keys = [(version, _normalize_query(query), k) for query in queries]
+    results = [_search_results_cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    
+    if missing:
+        embeddings = get_embeddings().embed_queries([queries[i] for i in missing])
+        with CHROMA_QUERY_DURATION.time():
+            response = vectorstore._collection.query(
+                query_embeddings=embeddings,
+                n_results=k,
+                include=["documents", "metadatas", "distances"]
+            )
+        for j, i in enumerate(missing):
+            results[i] = [
+                (Document(page_content=content, metadata=metadata or {}), distance)
+                for content, metadata, distance in zip(
+                    response["documents"][j], response["metadatas"][j], response["distances"][j]
+                )
+            ]
+            _search_results_cache.set(keys[i], results[i])
     
-    return documents
+    return results
 
 
-def _should_reindex() -> bool:
+def _get_lexical_index(vectorstore) -> BM25Index:
+    """Load the BM25 index, rebuilding it from the ChromaDB collection if it is missing"""
+    global _lexical_index
+    if _lexical_index is not None:
+        return _lexical_index
+    with _index_lock:
+        if _lexical_index is None:
+            lexical_index = BM25Index.load(_lexical_index_file)
+            if lexical_index is None:
+                lexical_index = BM25Index()
+                stored = vectorstore.get(include=["documents", "metadatas"])
+                for chunk_id, content, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                    lexical_index.add(chunk_id, content, metadata)
+                if len(lexical_index):
+                    lexical_index.save(_lexical_index_file)
+            _lexical_index = lexical_index
+    return _lexical_index
+
+
+def _hybrid_search_batch(vectorstore, queries: list, k: int) -> list:
     """
-    Check if reindexing is needed based on file changes
+    Hybrid lexical (BM25) + dense search.
+    Returns [(document, dense distance or None, term coverage or None)] per query.
+    
+    - If the best BM25 hit covers at least RAG_LEXICAL_SHORTCUT of the query terms,
+      the query is answered locally from the BM25 index (no embedding call, so no
+      dense distance: only the term coverage is reported).
+    - Otherwise dense and lexical candidates are ranked by
+      max(dense, alpha * dense + (1 - alpha) * term coverage).
+      Lexical-only candidates use the lowest dense similarity of the top-k as an
+      upper bound of their dense similarity for ranking, and are reported without distance.
     """
-    metadata = _load_index_metadata()
+    if not Config.RAG_HYBRID_ENABLED:
+        return [
+            [(doc, distance, None) for doc, distance in results]
+            for results in _similarity_search_batch(vectorstore, queries, k)
+        ]
     
-    # Check local documents
-    doc_directory = Config.DOCUMENTS_DIRECTORY
-    if os.path.exists(doc_directory):
-        for file_path in Path(doc_directory).rglob('*'):
-            if file_path.is_file():
-                file_str = str(file_path)
-                file_hash = _get_document_hash(file_str)
-                
-                if file_str not in metadata or metadata.get(file_str) != file_hash:
-                    return True
+    lexical_index = _get_lexical_index(vectorstore)
+    alpha = Config.RAG_HYBRID_ALPHA
     
-    # If no metadata exists, we need to index
-    if not metadata:
+    # Candidats lexicaux : {chunk_id: (document, couverture des termes de la requête)}
+    lexical = []
+    for query in queries:
+        candidates = {}
+        for chunk_id, _ in lexical_index.search(query, k):
+            doc = lexical_index.docs[chunk_id]
+            candidates[chunk_id] = (
+                Document(page_content=doc["text"], metadata=dict(doc["metadata"])),
+                query_coverage(query, doc["text"])
+            )
+        lexical.append(candidates)
+    
+    results = [None] * len(queries)
+    dense_indices = []
+    for i, candidates in enumerate(lexical):
+        best_coverage = max((coverage for _, coverage in candidates.values()), default=0.0)
+        if best_coverage >= Config.RAG_LEXICAL_SHORTCUT:
+            ranked = sorted(candidates.values(), key=lambda item: item[1], reverse=True)[:k]
+            results[i] = [(doc, None, coverage) for doc, coverage in ranked]
+        else:
+            dense_indices.append(i)
+    
+    if dense_indices:
+        dense_results = _similarity_search_batch(vectorstore, [queries[i] for i in dense_indices], k)
+        for i, dense in zip(dense_indices, dense_results):
+            fused = {}
+            for doc, distance in dense:
+                fused[" ".join(doc.page_content.split())] = (doc, distance, query_coverage(queries[i], doc.page_content))
+            
+            dense_floor = min((1.0 / (1.0 + distance) for _, distance in dense), default=0.0)
+            for doc, coverage in lexical[i].values():
+                fused.setdefault(" ".join(doc.page_content.split()), (doc, None, coverage))
+            
+            def fused_score(item):
+                _, distance, coverage = item
+                dense_similarity = dense_floor if distance is None else 1.0 / (1.0 + distance)
+                return max(dense_similarity, alpha * dense_similarity + (1 - alpha) * coverage)
+            
+            results[i] = sorted(fused.values(), key=fused_score, reverse=True)[:k]
+    
+    return results
+
+
+def _split_documents(documents: list) -> list:
+    """Split documents into chunks for indexing"""
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        length_function=len
+    )
+    return text_splitter.split_documents(documents)
+
+
+def _chunk_id(source_file: str, content: str) -> str:
+    """Stable chunk ID derived from the source file path and the chunk content hash"""
+    chunk_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{source_file}:{chunk_hash}".encode("utf-8")).hexdigest()
+
+
+def _scan_documents(metadata: dict) -> dict:
+    """
+    Build the manifest of the documents directory: {path: {hash, size, mtime_ns, inode}}.
+    A file is only hashed when its (size, mtime_ns, inode) differs from the previous manifest.
+    """
+    manifest = {}
+    for file_path in _list_document_files(Config.DOCUMENTS_DIRECTORY):
+        file_str = str(file_path)
+        stat = _get_file_stat(file_str)
+        previous = metadata.get(file_str)
+        
+        if isinstance(previous, dict) and stat and all(previous.get(k) == v for k, v in stat.items()):
+            manifest[file_str] = previous
+        else:
+            manifest[file_str] = {"hash": _get_document_hash(file_str), **stat}
+    
+    return manifest
+
+
+def _has_changes(metadata: dict, manifest: dict) -> bool:
+    """True if files were added, deleted or modified (content hash) since the last indexing"""
+    if metadata.keys() != manifest.keys():
         return True
+    return any(_is_changed(metadata[f], entry) for f, entry in manifest.items())
+
+
+def _open_vectorstore(embeddings):
+    """Open the persisted ChromaDB collection"""
+    return Chroma(
+        persist_directory=Config.CHROMA_PERSIST_DIRECTORY,
+        embedding_function=embeddings
+    )
+
+
+def _index_file(vectorstore, lexical_index: BM25Index, file_str: str, docs: list):
+    """
+    Diff the chunks of one loaded file against the index. Chunks that disappeared from
+    the file are deleted; chunks already present (same ID) will not be re-embedded.
+    The BM25 index is updated alongside.
     
-    return False
+    Returns (new chunks as [(id, document)], number of removed chunks).
+    """
+    chunks = {}
+    for split in _split_documents(docs):
+        # Les chunks identiques dans un même fichier n'apportent rien, on les dédoublonne
+        chunks.setdefault(_chunk_id(file_str, split.page_content), split)
+    
+    existing_ids = set(vectorstore.get(where={"source_file": file_str}, include=[])["ids"])
+    
+    stale_ids = [chunk_id for chunk_id in existing_ids if chunk_id not in chunks]
+    if stale_ids:
+        vectorstore.delete(ids=stale_ids)
+    for chunk_id in stale_ids:
+        lexical_index.remove(chunk_id)
+    
+    new_chunks = [(chunk_id, split) for chunk_id, split in chunks.items() if chunk_id not in existing_ids]
+    for chunk_id, split in new_chunks:
+        lexical_index.add(chunk_id, split.page_content, split.metadata)
+    return new_chunks, len(stale_ids)
+
+
+def _add_chunks(vectorstore, chunks: list):
+    """
+    Write chunks [(id, document)] to ChromaDB in bulk. Each call embeds its whole batch
+    through the embedding scheduler (concurrent, rate-limit aware).
+    """
+    batch_size = Config.CHROMA_ADD_BATCH_SIZE
+    for i in range(0, len(chunks), batch_size):
+        batch = chunks[i:i + batch_size]
+        vectorstore.add_documents(
+            [split for _, split in batch],
+            ids=[chunk_id for chunk_id, _ in batch]
+        )
+        print(f"📦 {min(i + batch_size, len(chunks))}/{len(chunks)} chunk(s) written")
+
+
+def _remove_file(vectorstore, file_str: str):
+    """Remove all chunks of a deleted file"""
+    vectorstore._collection.delete(where={"source_file": file_str})
 
 
 def _get_vectorstore(force_reindex: bool = False):
     """
-    Get or create the ChromaDB vectorstore with support for multiple file sources
+    Get or create the ChromaDB vectorstore with support for multiple file sources.
+    
+    Reindexing is incremental: only added, modified and deleted files touch the index.
+    force_reindex=True clears the collection and rebuilds it from scratch.
+    
+    The documents directory is scanned at most once every RAG_CHANGE_CHECK_INTERVAL
+    seconds, including when it held no documents. Only one thread checks and reindexes at a
+    time; while it does, the other threads keep using the cached vectorstore.
     """
-    global _vectorstore_cache
+    # Scan récent : index en cache, ou None si le dossier ne contenait aucun document
+    if not force_reindex and _checked_recently():
+        return _vectorstore_cache
+    if not force_reindex and _vectorstore_cache is not None:
+        if not _index_lock.acquire(blocking=False):
+            return _vectorstore_cache
+    else:
+        _index_lock.acquire()
+    try:
+        # Scan fait par un autre thread pendant l'attente du verrou
+        if not force_reindex and _checked_recently():
+            return _vectorstore_cache
+        return _refresh_vectorstore(force_reindex)
+    finally:
+        _index_lock.release()
+
+
+def _checked_recently() -> bool:
+    """True if the documents directory was scanned less than RAG_CHANGE_CHECK_INTERVAL seconds ago"""
+    return time.monotonic() - _last_change_check < Config.RAG_CHANGE_CHECK_INTERVAL
+
+
+def open_persisted_index():
+    """
+    Open the persisted index without scanning the documents directory, so searches can be
+    served right away at startup; changes are applied afterwards by refresh_index().
+    
+    Returns the vectorstore, or None if there is no usable index yet (never built, or built
+    with another embedding backend).
+    """
+    global _vectorstore_cache, _last_change_check
+    with _index_lock:
+        if _vectorstore_cache is None:
+            metadata = _load_index_metadata()
+            index_info = _load_index_info()
+            if not metadata or (index_info and index_info != get_embedding_signature()):
+                return None
+            vectorstore = _open_vectorstore(get_embeddings())
+            _get_lexical_index(vectorstore)
+            _set_index_version(metadata)
+            _vectorstore_cache = vectorstore
+            # Les recherches ne lancent pas de scan : refresh_index() est appelé juste après
+            _last_change_check = time.monotonic()
+            print("✓ Opened persisted index")
+        return _vectorstore_cache
+
+
+def refresh_index():
+    """Scan the documents directory now and apply its changes to the index"""
+    with _index_lock:
+        return _refresh_vectorstore(False)
+
+
+def _refresh_vectorstore(force_reindex: bool):
+    """Check the documents directory and apply its changes to the index (under _index_lock)"""
+    global _vectorstore_cache, _last_change_check, _lexical_index
+    
+    # Un index construit avec un autre backend d'embedding est incompatible : reconstruction complète
+    if not force_reindex and _vectorstore_cache is None:
+        index_info = _load_index_info()
+        if index_info and index_info != get_embedding_signature():
+            print(f"⚠️  Index built with {index_info}, current backend is {get_embedding_signature()}: full reindex")
+            force_reindex = True
+    
+    metadata = {} if force_reindex else _load_index_metadata()
     
     # Check if reindexing is needed
     if not force_reindex and _vectorstore_cache is not None:
-        if not _should_reindex():
+        _last_change_check = time.monotonic()
+        manifest = _scan_documents(metadata)
+        if metadata and not _has_changes(metadata, manifest):
+            if manifest != metadata:
+                # Fichiers "touchés" sans changement de contenu : on rafraîchit le manifest
+                _save_index_metadata(manifest)
             print("Using cached vectorstore (no changes detected)")
             return _vectorstore_cache
+    else:
+        manifest = _scan_documents(metadata)
     
-    print("=" * 50)
-    print("Indexing documents in ChromaDB...")
-    print("=" * 50)
-    
-    # Load documents from local directory
-    all_documents = _load_documents_from_directory(Config.DOCUMENTS_DIRECTORY)
+    embeddings = get_embeddings()
     
-    if not all_documents:
+    if not manifest and not metadata:
+        # Pas de re-scan à chaque requête tant que le dossier reste vide
+        _last_change_check = time.monotonic()
         print(f"⚠️  No documents found in {Config.DOCUMENTS_DIRECTORY}/")
         print(f"   Place your PDF, TXT, DOCX, or MD files in {Config.DOCUMENTS_DIRECTORY}/")
         
         # Try to load existing vectorstore if it exists
         if os.path.exists(Config.CHROMA_PERSIST_DIRECTORY) and os.listdir(Config.CHROMA_PERSIST_DIRECTORY):
             try:
-                embeddings = OpenAIEmbeddings(api_key=Config.OPENAI_API_KEY)
-                vectorstore = Chroma(
-                    persist_directory=Config.CHROMA_PERSIST_DIRECTORY,
-                    embedding_function=embeddings
-                )
+                vectorstore = _open_vectorstore(embeddings)
                 _vectorstore_cache = vectorstore
+                _set_index_version(metadata)
                 print("✓ Using existing index")
                 return vectorstore
             except Exception as e:
@@ -184,131 +641,172 @@ def _get_vectorstore(force_reindex: bool = False):
         
         return None
     
-    print(f"\n📄 Total documents loaded: {len(all_documents)} chunks")
+    deleted_files = [file_str for file_str in metadata if file_str not in manifest]
+    changed_files = [
+        file_str for file_str, entry in manifest.items()
+        if _is_changed(metadata.get(file_str), entry)
+    ]
     
-    # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len
-    )
-    splits = text_splitter.split_documents(all_documents)
-    print(f"📦 Split into {len(splits)} chunks for indexing")
+    # Fichiers inchangés : on reprend l'entrée à jour du manifest (stat rafraîchi)
+    for file_str in manifest.keys() - set(changed_files):
+        metadata[file_str] = manifest[file_str]
     
-    # Create embeddings and vectorstore
-    print("🔄 Creating embeddings (this may take a moment)...")
-    embeddings = OpenAIEmbeddings(api_key=Config.OPENAI_API_KEY)
+    if not force_reindex and not deleted_files and not changed_files:
+        # Index déjà à jour : ouvert tel quel, sans réécrire l'index BM25
+        vectorstore = _open_vectorstore(embeddings)
+        _get_lexical_index(vectorstore)
+        _save_index_metadata(metadata)
+        _set_index_version(metadata)
+        _vectorstore_cache = vectorstore
+        _last_change_check = time.monotonic()
+        print("✓ Index up to date (no changes detected)")
+        return vectorstore
+    
+    print("=" * 50)
+    print("Indexing documents in ChromaDB...")
+    print("=" * 50)
     
-    # Clear existing index if it exists and we're reindexing
-    if force_reindex or _should_reindex():
+    # Clear existing index if we're forcing a full rebuild
+    if force_reindex:
         if os.path.exists(Config.CHROMA_PERSIST_DIRECTORY) and os.listdir(Config.CHROMA_PERSIST_DIRECTORY):
             try:
-                old_vectorstore = Chroma(
-                    persist_directory=Config.CHROMA_PERSIST_DIRECTORY,
-                    embedding_function=embeddings
-                )
-                old_vectorstore.delete_collection()
+                _open_vectorstore(embeddings).delete_collection()
                 print("🗑️  Cleared old index")
             except Exception:
                 pass
     
-    # Create or update vectorstore
-    vectorstore = Chroma.from_documents(
-        documents=splits,
-        embedding=embeddings,
-        persist_directory=Config.CHROMA_PERSIST_DIRECTORY
-    )
+    vectorstore = _open_vectorstore(embeddings)
+    # Les recherches en cours gardent l'index BM25 actuel : les changements sont appliqués à une copie
+    lexical_index = BM25Index() if force_reindex else _get_lexical_index(vectorstore).copy()
+    print(f"📄 {len(changed_files)} new/modified file(s), {len(deleted_files)} deleted file(s)")
+    
+    for file_str in deleted_files:
+        _remove_file(vectorstore, file_str)
+        lexical_index.remove_source(file_str)
+        metadata.pop(file_str, None)
+        print(f"🗑️  Removed {Path(file_str).name}")
+    
+    loaded = _load_files(changed_files) if changed_files else {}
+    
+    new_chunks = []
+    indexed_files = []
+    for file_str in changed_files:
+        docs = loaded.get(file_str)
+        if docs is None:
+            # Fichier illisible ou timeout : enregistré en échec, retenté seulement s'il est modifié
+            metadata[file_str] = {**manifest[file_str], "failed": True}
+            continue
+        file_chunks, removed = _index_file(vectorstore, lexical_index, file_str, docs)
+        new_chunks.extend(file_chunks)
+        indexed_files.append(file_str)
+        print(f"📄 {Path(file_str).name}: {len(file_chunks)} new chunk(s), {removed} stale chunk(s) removed")
     
-    # Save metadata
-    metadata = {}
-    doc_directory = Config.DOCUMENTS_DIRECTORY
-    if os.path.exists(doc_directory):
-        for file_path in Path(doc_directory).rglob('*'):
-            if file_path.is_file():
-                metadata[str(file_path)] = _get_document_hash(str(file_path))
+    if new_chunks:
+        print(f"🔄 Creating embeddings for {len(new_chunks)} chunk(s) (this may take a moment)...")
+        # Les embeddings d'indexation passent après les appels des rapports en cours
+        with llm_priority(PRIORITY_INDEXING):
+            _add_chunks(vectorstore, new_chunks)
     
+    for file_str in indexed_files:
+        metadata[file_str] = manifest[file_str]
+    _lexical_index = lexical_index
+    lexical_index.save(_lexical_index_file)
+    _save_index_info()
     _save_index_metadata(metadata)
+    _set_index_version(metadata)
     
     _vectorstore_cache = vectorstore
+    _last_change_check = time.monotonic()
     print("✅ Indexing complete!")
     print("=" * 50)
     return vectorstore
 
 
-@tool
-def search_internal_knowledge(query: str) -> str:
+def _to_retrieval_result(query: str, results: list) -> RetrievalResult:
+    """Convert [(document, distance or None, term coverage or None)] into a RetrievalResult"""
+    chunks = []
+    for doc, distance, coverage in results:
+        source_file = doc.metadata.get('source_file', 'Unknown')
+        chunks.append(RetrievedChunk(
+            content=doc.page_content,
+            distance=distance,
+            # Convertir distance en score de similarité (0.0 à 1.0)
+            # Distance 0.0 → score 1.0, Distance 1.0 → score 0.5, Distance 2.0 → score 0.33
+            similarity=None if distance is None else 1.0 / (1.0 + distance),
+            lexical_score=coverage,
+            source_file=source_file,
+            file_name=doc.metadata.get('file_name', Path(source_file).name if source_file != 'Unknown' else 'Unknown'),
+            file_type=doc.metadata.get('file_type')
+        ))
+    return RetrievalResult(query=query, chunks=chunks)
+
+
+@timed(TOOL_DURATION, tool="retrieve_internal_knowledge")
+def retrieve_internal_knowledge_batch(queries: list, k: int = 3) -> list:
     """
-    Recherche dans la base de connaissances interne KPMG.
-    Supporte plusieurs formats : PDF, TXT, DOCX, MD depuis data/documents/
+    Recherche groupée dans la base interne : un seul appel d'embedding et une seule
+    requête ChromaDB pour toutes les requêtes.
     
     Args:
-        query: Requête de recherche
+        queries: Liste de requêtes de recherche
+        k: Nombre de chunks par requête
         
     Returns:
-        Informations trouvées ou message indiquant absence de résultats
+        Liste de RetrievalResult, dans l'ordre des requêtes
     """
     vectorstore = _get_vectorstore()
     
     if vectorstore is None:
-        return f"Aucune information trouvée dans la base interne KPMG (aucun document indexé dans {Config.DOCUMENTS_DIRECTORY}/)."
+        message = f"Aucune information trouvée dans la base interne KPMG (aucun document indexé dans {Config.DOCUMENTS_DIRECTORY}/)."
+        return [RetrievalResult(query=query, message=message) for query in queries]
     
     try:
-        # Recherche avec métadonnées pour traçabilité
-        # Réduire k à 3 pour éviter trop de répétitions
-        results = vectorstore.similarity_search_with_score(query, k=3)
-        
-        if results:
-            # Grouper les résultats par fichier source pour éviter les répétitions
-            results_by_file = {}
-            for doc, score in results:
-                source_file = doc.metadata.get('source_file', 'Unknown')
-                file_name = doc.metadata.get('file_name', Path(source_file).name if source_file != 'Unknown' else 'Unknown')
-                content = doc.page_content
-                
-                if file_name not in results_by_file:
-                    results_by_file[file_name] = []
-                
-                results_by_file[file_name].append({
-                    'content': content,
-                    'score': score
-                })
-            
-            # Formater les résultats en consolidant par fichier
-            formatted_results = []
-            global_best_distance = float('inf')  # Pour suivre la meilleure distance globale
-            
-            for file_name, file_results in results_by_file.items():
-                # ChromaDB retourne des distances (plus bas = mieux)
-                # Prendre la distance la plus faible (meilleur match)
-                best_distance = min(r['score'] for r in file_results)
-                global_best_distance = min(global_best_distance, best_distance)
-                
-                # Convertir distance en score de similarité (0.0 à 1.0)
-                # Distance 0.0 → score 1.0, Distance 1.0 → score 0.5, Distance 2.0 → score 0.33
-                similarity_score = 1.0 / (1.0 + best_distance)
-                
-                # Consolider le contenu (enlever les doublons partiels)
-                contents = [r['content'] for r in file_results]
-                # Joindre les contenus uniques
-                unique_contents = []
-                seen_content = set()
-                for content in contents:
-                    # Normaliser le contenu pour détecter les doublons
-                    content_normalized = ' '.join(content.split())
-                    if content_normalized not in seen_content:
-                        seen_content.add(content_normalized)
-                        unique_contents.append(content)
-                
-                consolidated_content = '\n\n'.join(unique_contents)
-                # Afficher le score de similarité (plus lisible) et la distance (pour debug)
-                formatted_results.append(f"[Source: {file_name} | Similarity: {similarity_score:.2f} | Distance: {best_distance:.3f}]\n{consolidated_content}")
-            
-            # Ajouter le meilleur score global au début pour faciliter l'extraction
-            best_similarity = 1.0 / (1.0 + global_best_distance)
-            result_text = "\n\n---\n\n".join(formatted_results)
-            # Préfixer avec le meilleur score pour extraction facile
-            return f"[BEST_SIMILARITY: {best_similarity:.3f}]\n{result_text}"
-        else:
-            return "Aucune information trouvée dans la base interne KPMG."
+        return [
+            _to_retrieval_result(query, results)
+            for query, results in zip(queries, _hybrid_search_batch(vectorstore, queries, k))
+        ]
     except Exception as e:
-        return f"Erreur lors de la recherche interne: {str(e)}"
+        return [RetrievalResult(query=query, message=f"Erreur lors de la recherche interne: {str(e)}") for query in queries]
+
+
+def retrieve_internal_knowledge(query: str, k: int = 3) -> RetrievalResult:
+    """
+    Recherche dans la base interne KPMG, résultat structuré (chunks, distances, similarité, sources).
+    
+    Args:
+        query: Requête de recherche
+        k: Nombre de chunks
+        
+    Returns:
+        RetrievalResult
+    """
+    return retrieve_internal_knowledge_batch([query], k)[0]
+
+
+async def aretrieve_internal_knowledge_batch(queries: list, k: int = 3) -> list:
+    """
+    Version async de retrieve_internal_knowledge_batch : ChromaDB et les embeddings
+    sont bloquants, ils sont exécutés dans le pool de threads partagé.
+    """
+    return await run_blocking(retrieve_internal_knowledge_batch, queries, k)
+
+
+async def aretrieve_internal_knowledge(query: str, k: int = 3) -> RetrievalResult:
+    """Version async de retrieve_internal_knowledge"""
+    return (await aretrieve_internal_knowledge_batch([query], k))[0]
+
+
+@tool
+def search_internal_knowledge(query: str) -> str:
+    """
+    Recherche dans la base de connaissances interne KPMG.
+    Supporte plusieurs formats : PDF, TXT, DOCX, MD depuis data/documents/
+    
+    Args:
+        query: Requête de recherche
+        
+    Returns:
+        Informations trouvées ou message indiquant absence de résultats
+    """
+    # Réduire k à 3 pour éviter trop de répétitions
+    return retrieve_internal_knowledge(query, k=3).render()
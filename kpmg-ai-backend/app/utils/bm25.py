@@ -0,0 +1,132 @@
+"""Local BM25 inverted index over the indexed chunks (lexical side of hybrid search)"""
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+import json
+import math
+import os
+import re
+
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Mots vides FR/EN ignorés par l'index et les requêtes
+_STOPWORDS = {
+    "le", "la", "les", "un", "une", "des", "du", "de", "d", "l", "et", "ou", "en", "au", "aux",
+    "pour", "par", "sur", "dans", "avec", "sans", "est", "sont", "ce", "cette", "ces", "qui", "que",
+    "the", "a", "an", "of", "and", "or", "in", "on", "for", "to", "with", "is", "are",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, without stopwords and single characters"""
+    return [
+        token for token in _TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in _STOPWORDS
+    ]
+
+
+def query_coverage(query: str, text: str) -> float:
+    """Share of the distinct query terms present in a text (0.0 to 1.0)"""
+    terms = set(tokenize(query))
+    if not terms:
+        return 0.0
+    return len(terms & set(tokenize(text))) / len(terms)
+
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index keyed by chunk ID, persisted as JSON.
+    Chunk text and metadata are stored so lexical hits can be answered locally.
+    """
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, dict] = {}
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.total_length = 0
+    
+    def __len__(self) -> int:
+        return len(self.docs)
+    
+    def add(self, chunk_id: str, text: str, metadata: Optional[dict] = None, tf: Optional[dict] = None):
+        """Add (or replace) a chunk"""
+        if chunk_id in self.docs:
+            self.remove(chunk_id)
+        if tf is None:
+            tf = dict(Counter(tokenize(text)))
+        length = sum(tf.values())
+        self.docs[chunk_id] = {"text": text, "metadata": metadata or {}, "tf": tf, "length": length}
+        for term, count in tf.items():
+            self.postings[term][chunk_id] = count
+        self.total_length += length
+    
+    def remove(self, chunk_id: str):
+        """Remove a chunk if present"""
+        doc = self.docs.pop(chunk_id, None)
+        if doc is None:
+            return
+        for term in doc["tf"]:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= doc["length"]
+    
+    def copy(self) -> "BM25Index":
+        """Independent copy (chunk entries are shared, they are never modified in place)"""
+        index = BM25Index(k1=self.k1, b=self.b)
+        index.docs = dict(self.docs)
+        index.postings = defaultdict(dict, {term: dict(postings) for term, postings in self.postings.items()})
+        index.total_length = self.total_length
+        return index
+    
+    def remove_source(self, source_file: str):
+        """Remove every chunk of a source file"""
+        for chunk_id in [cid for cid, doc in self.docs.items() if doc["metadata"].get("source_file") == source_file]:
+            self.remove(chunk_id)
+    
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k chunks by BM25 score: [(chunk_id, score)]"""
+        terms = set(tokenize(query))
+        if not terms or not self.docs:
+            return []
+        
+        n_docs = len(self.docs)
+        avg_length = self.total_length / n_docs if n_docs else 0.0
+        scores: Dict[str, float] = defaultdict(float)
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, count in postings.items():
+                length_norm = 1 - self.b + self.b * self.docs[chunk_id]["length"] / (avg_length or 1.0)
+                scores[chunk_id] += idf * count * (self.k1 + 1) / (count + self.k1 * length_norm)
+        
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+    
+    def save(self, path: str):
+        """Persist the index as JSON (postings are rebuilt on load)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        docs = {cid: {"text": d["text"], "metadata": d["metadata"], "tf": d["tf"]} for cid, d in self.docs.items()}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "docs": docs}, f)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        """Load a persisted index, or None if missing/unreadable"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except Exception:
+            return None
+        index = cls(k1=data.get("k1", 1.5), b=data.get("b", 0.75))
+        for chunk_id, doc in data.get("docs", {}).items():
+            index.add(chunk_id, doc["text"], doc.get("metadata"), tf=doc.get("tf"))
+        return index
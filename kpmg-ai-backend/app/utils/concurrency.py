@@ -0,0 +1,38 @@
+"""Bounded thread pool for blocking calls made from async code"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+import asyncio
+import contextvars
+from app.config import Config
+
+
+_blocking_pool = None
+
+
+def get_blocking_pool() -> ThreadPoolExecutor:
+    """Shared pool (BLOCKING_POOL_WORKERS threads), created on first use"""
+    global _blocking_pool
+    if _blocking_pool is None:
+        _blocking_pool = ThreadPoolExecutor(
+            max_workers=max(1, Config.BLOCKING_POOL_WORKERS),
+            thread_name_prefix="blocking"
+        )
+    return _blocking_pool
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking function in the shared pool without blocking the event loop
+    
+    Args:
+        func: Blocking function (ChromaDB, embeddings, file I/O...)
+        *args, **kwargs: Arguments passed to func
+    
+    Returns:
+        The function's return value
+    """
+    loop = asyncio.get_running_loop()
+    # Le contexte (ex: priorité des appels OpenAI) suit l'appel dans le thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_blocking_pool(), partial(context.run, func, *args, **kwargs))
@@ -0,0 +1,345 @@
+"""Embeddings factory (OpenAI or local backends) with a persistent, content-addressed embedding cache"""
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from app.config import Config
+from app.utils.lru_cache import LRUTTLCache
+from app.utils.bm25 import tokenize
+from app.utils.metrics import register_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+import contextvars
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+
+# Limite de variables SQLite par requête (999 sur les anciennes versions)
+_SQLITE_BATCH_SIZE = 500
+
+
+def _text_hash(text: str) -> str:
+    """Content hash of a chunk text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def _rate_limit_delay(error: Exception, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retrying if the error is a rate limit (HTTP 429), else None.
+    Honours the Retry-After / Retry-After-Ms headers, with exponential backoff as fallback.
+    """
+    response = getattr(error, "response", None)
+    status_code = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status_code != 429:
+        return None
+    
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return min(60.0, 2.0 ** attempt)
+
+
+class EmbeddingScheduler:
+    """
+    Packs texts into token-bounded batches and embeds several batches concurrently.
+    Concurrency is adaptive: halved on every rate limit (and paused for Retry-After),
+    then increased by one after a full window of successful batches.
+    """
+    
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]], max_batch_tokens: int,
+                 max_batch_size: int, max_concurrency: int, max_retries: int = 6):
+        self.embed_fn = embed_fn
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.rate_limited = 0
+        self._limit = self.max_concurrency
+        self._in_flight = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+    
+    def _batches(self, texts: List[str]) -> List[tuple]:
+        """Split texts into (start, end) ranges bounded in tokens and in number of texts"""
+        batches = []
+        start = 0
+        tokens = 0
+        for i, text in enumerate(texts):
+            text_tokens = _estimate_tokens(text)
+            if i > start and (tokens + text_tokens > self.max_batch_tokens or i - start >= self.max_batch_size):
+                batches.append((start, i))
+                start, tokens = i, 0
+            tokens += text_tokens
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+    
+    def _acquire(self):
+        with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0 and self._in_flight < self._limit:
+                    self._in_flight += 1
+                    return
+                self._condition.wait(timeout=pause if pause > 0 else None)
+    
+    def _release(self, rate_limit_delay: Optional[float] = None):
+        with self._condition:
+            self._in_flight -= 1
+            if rate_limit_delay is not None:
+                self.rate_limited += 1
+                self._limit = max(1, self._limit // 2)
+                self._successes = 0
+                self._paused_until = max(self._paused_until, time.monotonic() + rate_limit_delay)
+            else:
+                self._successes += 1
+                if self._successes >= self._limit and self._limit < self.max_concurrency:
+                    self._limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+    
+    def _run_batch(self, batch: List[str]) -> List[List[float]]:
+        """Embed one batch, retrying on rate limits"""
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            try:
+                vectors = self.embed_fn(batch)
+            except Exception as e:
+                delay = _rate_limit_delay(e, attempt)
+                self._release(delay)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                continue
+            self._release()
+            return vectors
+    
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, keeping the input order"""
+        batches = self._batches(texts)
+        if len(batches) <= 1:
+            return self._run_batch(texts) if texts else []
+        
+        vectors = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+            # Chaque batch garde le contexte de l'appelant (priorité des appels OpenAI)
+            futures = [
+                pool.submit(contextvars.copy_context().run, self._run_batch, texts[start:end])
+                for start, end in batches
+            ]
+            for (start, end), future in zip(batches, futures):
+                vectors[start:end] = future.result()
+        return vectors
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper backed by a SQLite cache keyed by (model, text hash).
+    Vectors are stored as float32 blobs, so a rebuild only pays for new text.
+    """
+    
+    def __init__(self, underlying: Embeddings, model_name: str, cache_path: str):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.scheduler = EmbeddingScheduler(
+            underlying.embed_documents,
+            max_batch_tokens=Config.EMBEDDING_BATCH_TOKENS,
+            max_batch_size=Config.EMBEDDING_BATCH_SIZE,
+            max_concurrency=Config.EMBEDDING_CONCURRENCY
+        )
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._query_cache = LRUTTLCache(Config.RAG_QUERY_CACHE_SIZE, Config.RAG_QUERY_CACHE_TTL)
+        
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+    
+    def _lookup(self, keys: List[str]) -> dict:
+        """Fetch cached vectors for the given text hashes"""
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQLITE_BATCH_SIZE):
+                batch = keys[i:i + _SQLITE_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, *batch]
+                )
+                for text_hash, vector in rows:
+                    found[text_hash] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return found
+    
+    def _store(self, vectors: dict):
+        """Persist vectors {text hash: vector} as float32 blobs"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [
+                    (self.model_name, text_hash, np.asarray(vector, dtype=np.float32).tobytes())
+                    for text_hash, vector in vectors.items()
+                ]
+            )
+            self._conn.commit()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, only calling the underlying model for texts not yet cached"""
+        keys = [_text_hash(text) for text in texts]
+        cached = self._lookup(list(set(keys)))
+        
+        # Textes à embedder (dédoublonnés)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        
+        if missing:
+            vectors = self.scheduler.embed(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            cached.update(computed)
+        
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return [list(cached[key]) for key in keys]
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query (in-memory LRU+TTL cache, keyed by normalized query)"""
+        return self.embed_queries([text])[0]
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several search queries, uncached ones in a single request"""
+        keys = [" ".join(text.lower().split()) for text in texts]
+        vectors = {key: self._query_cache.get(key) for key in keys}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if vectors[key] is None and key not in missing:
+                missing[key] = text
+        
+        if missing:
+            computed = self.underlying.embed_documents(list(missing.values()))
+            for key, vector in zip(missing.keys(), computed):
+                self._query_cache.set(key, vector)
+                vectors[key] = vector
+        
+        return [vectors[key] for key in keys]
+    
+    def stats(self) -> dict:
+        """Cache hit/miss counters since process start"""
+        return {"hits": self.hits, "misses": self.misses, "rate_limited": self.scheduler.rate_limited}
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic local embeddings (no network): word unigrams and bigrams are hashed
+    into a fixed-size signed vector, L2-normalised. Batches are built with NumPy.
+    """
+    
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+    
+    def _features(self, text: str) -> List[str]:
+        tokens = tokenize(text)
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts in one NumPy matrix"""
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                rows.append(row)
+                columns.append(digest % self.dimensions)
+                signs.append(1.0 if digest >> 63 else -1.0)
+        
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64)), np.asarray(signs, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        return matrix.tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query"""
+        return self.embed_documents([text])[0]
+
+
+def _create_backend():
+    """
+    Create the embedding backend selected by EMBEDDING_BACKEND.
+    
+    Returns:
+        (embeddings, model identifier)
+    """
+    backend = Config.EMBEDDING_BACKEND
+    
+    if backend == "openai":
+        from app.utils.llm import get_http_client, get_async_http_client
+        underlying = OpenAIEmbeddings(
+            api_key=Config.OPENAI_API_KEY,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
+        )
+        return underlying, underlying.model
+    
+    if backend == "hashing":
+        return HashingEmbeddings(Config.EMBEDDING_DIMENSIONS), f"hashing-{Config.EMBEDDING_DIMENSIONS}"
+    
+    if backend == "local":
+        # Dépendance optionnelle : pip install sentence-transformers
+        try:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+            underlying = HuggingFaceEmbeddings(
+                model_name=Config.LOCAL_EMBEDDING_MODEL,
+                model_kwargs={"device": "cpu"},
+                encode_kwargs={"batch_size": Config.EMBEDDING_BATCH_SIZE}
+            )
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=local requires sentence-transformers (pip install sentence-transformers)"
+            ) from e
+        return underlying, Config.LOCAL_EMBEDDING_MODEL
+    
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend} (expected 'openai', 'hashing' or 'local')")
+
+
+# Instance partagée par tous les tools
+_embeddings = None
+
+
+def get_embeddings() -> CachedEmbeddings:
+    """Get the shared embeddings instance (backend selected in Config, with persistent cache)"""
+    global _embeddings
+    if _embeddings is None:
+        underlying, model_name = _create_backend()
+        _embeddings = CachedEmbeddings(
+            underlying,
+            model_name=model_name,
+            cache_path=Config.EMBEDDING_CACHE_PATH
+        )
+        register_cache("embeddings", _embeddings)
+        register_cache("embedding_queries", _embeddings._query_cache)
+    return _embeddings
+
+
+def get_embedding_signature() -> dict:
+    """Backend and model that produce the vectors (recorded with the index)"""
+    return {"embedding_backend": Config.EMBEDDING_BACKEND, "embedding_model": get_embeddings().model_name}
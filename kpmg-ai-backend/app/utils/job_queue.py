@@ -0,0 +1,258 @@
+"""In-process job queue: bounded worker pool, queue depth limit and per-job event log"""
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import time
+import uuid
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds its maximum number of pending jobs"""
+
+
+class Job:
+    """
+    A queued unit of work and the events it published
+    
+    Status: "queued" → "running" → "completed" | "failed"
+    """
+    
+    def __init__(self, payload: Any, key: Optional[str] = None, priority: int = 0):
+        self.id = f"job-{uuid.uuid4()}"
+        self.seq = 0
+        self.payload = payload
+        self.key = key
+        self.priority = priority
+        self.coalesced = 0  # Requêtes identiques rattachées à ce job
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Any] = None
+        self.error: Optional[str] = None
+        self.events: List[Optional[dict]] = []
+        self._replays: Dict[int, Optional[dict]] = {}  # Position → événement rejoué une fois le job terminé
+        self._changed = asyncio.Event()
+    
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+    
+    def publish(self, event: dict, transient: bool = False, replay: Optional[dict] = None):
+        """
+        Append an event to the job's log and wake up subscribers
+        
+        Args:
+            event: Event sent to the subscribers following the job
+            transient: Only kept while the job runs (e.g. token deltas): dropped from the
+                log once the job is done, late subscribers never receive it
+            replay: Version of the event kept in the log once the job is done (e.g. with
+                the content of the dropped transient events)
+        """
+        if transient or replay is not None:
+            self._replays[len(self.events)] = replay
+        self.events.append(event)
+        self._notify()
+    
+    def _compact(self):
+        """Drop transient events and store replay versions (a placeholder keeps positions stable)"""
+        for position, replay in self._replays.items():
+            self.events[position] = replay
+        self._replays = {}
+    
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    async def subscribe(self) -> AsyncIterator[dict]:
+        """
+        Every event of the job, from the first one, until the job is done
+        
+        Yields:
+            Published events (late subscribers first receive the events already published)
+        """
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.events):
+                event = self.events[index]
+                index += 1
+                if event is not None:
+                    yield event
+            if self.done:
+                return
+            await changed.wait()
+    
+    async def wait(self) -> Any:
+        """Wait for the job to finish and return its result"""
+        async for _ in self.subscribe():
+            pass
+        return self.result
+    
+    def to_dict(self) -> dict:
+        """Status summary (without result)"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "events": sum(1 for event in self.events if event is not None),
+            "coalesced": self.coalesced
+        }
+
+
+class JobQueue:
+    """
+    Priority queue (lowest priority first, then FIFO) executed by a fixed number of asyncio workers
+    
+    At most `workers` jobs run at once; `submit` refuses new jobs beyond `max_depth`
+    pending ones. Finished jobs are kept `ttl` seconds for status/result lookups.
+    """
+    
+    def __init__(self, runner: Callable[[Job], Awaitable[Any]], workers: int, max_depth: int, ttl: float):
+        self.runner = runner
+        self.workers = max(1, workers)
+        self.max_depth = max_depth
+        self.ttl = ttl
+        self._queue: Optional[asyncio.Queue] = None
+        self._jobs: Dict[str, Job] = {}
+        self._inflight: Dict[str, Job] = {}  # Clé de coalescence → job en attente ou en cours
+        self._tasks: List[asyncio.Task] = []
+        self._running = 0
+        self._submitted = 0  # Numéro d'ordre des jobs (FIFO à priorité égale)
+    
+    def start(self):
+        """Start the workers (from the running event loop)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_depth)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    async def stop(self):
+        """Cancel the workers (running jobs are interrupted)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue is not None else 0
+    
+    @property
+    def running(self) -> int:
+        """Number of jobs being executed"""
+        return self._running
+    
+    def submit(self, payload: Any, key: Optional[str] = None, priority: int = 0) -> Job:
+        """
+        Enqueue a job
+        
+        Args:
+            payload: Job input, available to the runner as job.payload
+            key: Optional coalescing key, see find()
+            priority: Jobs with a lower priority are run first
+        
+        Returns:
+            The queued job
+        
+        Raises:
+            QueueFullError: if max_depth jobs are already waiting
+        """
+        self.start()
+        self._prune()
+        job = Job(payload, key, priority)
+        job.seq = self._submitted
+        try:
+            self._queue.put_nowait((job.priority, job.seq, job))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue full ({self.max_depth} pending jobs)")
+        self._submitted += 1
+        self._jobs[job.id] = job
+        if key is not None:
+            self._inflight[key] = job
+        return job
+    
+    def record(self, payload: Any, priority: int = 0) -> Job:
+        """
+        Register a job executed outside the workers (e.g. served from a cache)
+        
+        It takes neither a worker nor a queue slot but can be looked up and followed like
+        the others; the caller publishes its events, then finishes it with complete()
+        """
+        self._prune()
+        job = Job(payload, priority=priority)
+        job.status = "running"
+        job.started_at = job.created_at
+        self._jobs[job.id] = job
+        return job
+    
+    def complete(self, job: Job, result: Any):
+        """Finish a job registered with record()"""
+        self._finish(job, result=result)
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        """Job by id (None if unknown or expired)"""
+        return self._jobs.get(job_id)
+    
+    def find(self, key: str) -> Optional[Job]:
+        """
+        Queued or running job submitted with this coalescing key
+        
+        Identical requests can subscribe to this job instead of running their own (single-flight)
+        """
+        job = self._inflight.get(key)
+        return job if job is not None and not job.done else None
+    
+    def position(self, job: Job) -> int:
+        """Number of jobs ahead of a queued job (0 once running)"""
+        if job.status != "queued":
+            return 0
+        return sum(
+            1 for other in self._jobs.values()
+            if other.status == "queued" and (other.priority, other.seq) < (job.priority, job.seq)
+        )
+    
+    def stats(self) -> dict:
+        return {"workers": self.workers, "running": self.running, "queued": self.depth, "max_depth": self.max_depth}
+    
+    def _prune(self):
+        """Forget jobs finished more than ttl seconds ago"""
+        limit = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished_at < limit]:
+            del self._jobs[job_id]
+    
+    def _finish(self, job: Job, result: Any = None, error: Optional[str] = None):
+        job.result, job.error = result, error
+        job.finished_at = time.time()
+        job.status = "failed" if error else "completed"
+        job._compact()
+        if job.key is not None and self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+        if error:
+            job.publish({"type": "error", "message": error})
+        else:
+            job._notify()
+    
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            self._running += 1
+            job.status = "running"
+            job.started_at = time.time()
+            job._notify()
+            try:
+                result = await self.runner(job)
+            except asyncio.CancelledError:
+                self._finish(job, error="Job cancelled")
+                raise
+            except Exception as e:
+                self._finish(job, error=str(e))
+            else:
+                self._finish(job, result=result)
+            finally:
+                self._running -= 1
+                self._queue.task_done()
@@ -0,0 +1,103 @@
+"""Process-wide LLM client registry with shared keep-alive HTTP connection pools"""
+from langchain_openai import ChatOpenAI
+from typing import Dict, Optional, Tuple
+import threading
+import httpx
+from app.config import Config
+from app.utils.rate_limit import get_scheduler, SchedulingTransport, AsyncSchedulingTransport
+
+
+# Pools de connexions partagés (sync / async) par tous les clients OpenAI et outils HTTP
+_http_client = None
+_async_http_client = None
+
+# Un client ChatOpenAI par (modèle, température)
+_llm_registry: Dict[Tuple[str, float], ChatOpenAI] = {}
+_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=Config.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=Config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(Config.LLM_TIMEOUT, connect=Config.LLM_CONNECT_TIMEOUT)
+
+
+def _rate_limit_scheduler():
+    return get_scheduler() if Config.LLM_RATE_LIMIT_ENABLED else None
+
+
+def _transport() -> httpx.BaseTransport:
+    return SchedulingTransport(httpx.HTTPTransport(limits=_limits()), _rate_limit_scheduler())
+
+
+def _async_transport() -> httpx.AsyncBaseTransport:
+    return AsyncSchedulingTransport(httpx.AsyncHTTPTransport(limits=_limits()), _rate_limit_scheduler())
+
+
+def get_http_client() -> httpx.Client:
+    """Shared synchronous HTTP client (keep-alive pool, OpenAI calls admitted by the rate limit scheduler)"""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(transport=_transport(), timeout=_timeout())
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Shared asynchronous HTTP client (keep-alive pool, OpenAI calls admitted by the rate limit scheduler)"""
+    global _async_http_client
+    with _lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(transport=_async_transport(), timeout=_timeout())
+        return _async_http_client
+
+
+def get_llm(temperature: float = 0.3, model: Optional[str] = None) -> ChatOpenAI:
+    """
+    Get the shared chat model for a model and temperature
+    
+    Args:
+        temperature: Sampling temperature
+        model: Model name (default Config.OPENAI_MODEL)
+    
+    Returns:
+        A ChatOpenAI instance reused across nodes and tools
+    """
+    model = model or Config.OPENAI_MODEL
+    key = (model, float(temperature))
+    llm = _llm_registry.get(key)
+    if llm is not None:
+        return llm
+    
+    http_client = get_http_client()
+    async_http_client = get_async_http_client()
+    with _lock:
+        if key not in _llm_registry:
+            _llm_registry[key] = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                api_key=Config.OPENAI_API_KEY,
+                timeout=Config.LLM_TIMEOUT,
+                max_retries=Config.LLM_MAX_RETRIES,
+                http_client=http_client,
+                http_async_client=async_http_client
+            )
+        return _llm_registry[key]
+
+
+async def close_http_clients():
+    """Close the shared connection pools (application shutdown)"""
+    global _http_client, _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
+    _llm_registry.clear()
@@ -0,0 +1,59 @@
+"""In-memory LRU cache with time-to-live"""
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import threading
+import time
+
+
+class LRUTTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached value
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, key: Hashable, value: Any):
+        """
+        Store a value, evicting the least recently used entries beyond maxsize
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
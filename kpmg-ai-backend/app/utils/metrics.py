@@ -0,0 +1,235 @@
+"""In-process metrics registry (counters, histograms, callback gauges) rendered in Prometheus text format"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+import functools
+import inspect
+import threading
+import time
+
+
+# Buckets (secondes) : appels courts (ChromaDB, cache) jusqu'aux nodes de plusieurs minutes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, one series per label values"""
+    
+    type = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram:
+    """Cumulative histogram (buckets, sum, count), one series per label values"""
+    
+    type = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}  # Labels → [compteurs par bucket (+Inf inclus), somme]
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+    
+    def time(self, **labels) -> "_Timer":
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+    
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class CallbackMetric:
+    """Gauge or counter whose values are read at collection time: callback() → {label values: value}"""
+    
+    def __init__(self, name: str, documentation: str, type: str, labelnames: Iterable[str], callback: Callable[[], dict]):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+    
+    def samples(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Registry:
+    """Collection of metrics rendered together by /metrics"""
+    
+    def __init__(self):
+        self._metrics: List = []
+    
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def callback(self, name: str, documentation: str, type: str, labelnames: Iterable[str], callback: Callable[[], dict]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, type, labelnames, callback))
+    
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def timed(histogram: Histogram, **labels):
+    """Decorator observing the duration of each call (sync or async function) in a histogram"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started, **labels)
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, **labels)
+        return wrapper
+    return decorator
+
+
+REGISTRY = Registry()
+
+# Caches instrumentés (attributs hits / misses), enregistrés à leur création
+_caches: Dict[str, object] = {}
+
+
+def register_cache(name: str, cache) -> None:
+    """Expose the hits/misses counters of a cache (ResultCache, LRUTTLCache, CachedEmbeddings)"""
+    _caches[name] = cache
+
+
+def _cache_counts(attribute: str) -> dict:
+    return {(name,): getattr(cache, attribute, 0) for name, cache in list(_caches.items())}
+
+
+# === Métriques partagées par les modules instrumentés ===
+NODE_DURATION = REGISTRY.histogram(
+    "kpmg_workflow_node_duration_seconds", "Duration of LangGraph workflow node executions", ["node"]
+)
+TOOL_DURATION = REGISTRY.histogram(
+    "kpmg_tool_duration_seconds", "Duration of tool calls (RAG retrieval, Linkup search, estimation)", ["tool"]
+)
+CHROMA_QUERY_DURATION = REGISTRY.histogram(
+    "kpmg_chroma_query_duration_seconds", "Duration of ChromaDB similarity queries"
+)
+OPENAI_REQUEST_DURATION = REGISTRY.histogram(
+    "kpmg_openai_request_duration_seconds",
+    "Duration of OpenAI HTTP requests until response headers (chat, embeddings)", ["endpoint"]
+)
+OPENAI_ESTIMATED_TOKENS = REGISTRY.counter(
+    "kpmg_openai_estimated_tokens_total", "Estimated tokens of OpenAI requests admitted by the scheduler", ["endpoint"]
+)
+OPENAI_RESPONSES = REGISTRY.counter(
+    "kpmg_openai_responses_total", "OpenAI HTTP responses by status code", ["endpoint", "status"]
+)
+SSE_STREAM_DURATION = REGISTRY.histogram(
+    "kpmg_sse_stream_duration_seconds", "Duration of SSE report streams",
+    buckets=(1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 180.0, 300.0, 600.0, 1200.0)
+)
+CASCADE_OUTCOMES = REGISTRY.counter(
+    "kpmg_cascade_outcomes_total", "Sections by source selected by the research cascade", ["source"]
+)
+COALESCED_REQUESTS = REGISTRY.counter(
+    "kpmg_coalesced_requests_total", "Report requests attached to an identical in-flight job"
+)
+REGISTRY.callback(
+    "kpmg_cache_hits_total", "Cache hits", "counter", ["cache"], lambda: _cache_counts("hits")
+)
+REGISTRY.callback(
+    "kpmg_cache_misses_total", "Cache misses", "counter", ["cache"], lambda: _cache_counts("misses")
+)
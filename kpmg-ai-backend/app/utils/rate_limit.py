@@ -0,0 +1,304 @@
+"""
+Process-wide OpenAI rate limit scheduler: every chat completion and embedding request
+is admitted through RPM/TPM token buckets, by priority class
+"""
+from contextlib import contextmanager
+from typing import Optional
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import threading
+import time
+import httpx
+from app.config import Config
+from app.utils.metrics import OPENAI_REQUEST_DURATION, OPENAI_ESTIMATED_TOKENS, OPENAI_RESPONSES
+
+
+# Classes de priorité (la plus petite passe en premier)
+PRIORITY_INTERACTIVE = 0  # Rapports streamés (un utilisateur attend)
+PRIORITY_BATCH = 1        # Jobs sans streaming
+PRIORITY_INDEXING = 2     # Embeddings d'indexation des documents
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch", PRIORITY_INDEXING: "indexing"}
+
+# Priorité des appels OpenAI du contexte courant (propagée aux tâches asyncio et à run_blocking)
+_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_BATCH)
+
+# Intervalle de réévaluation des requêtes en attente (secondes)
+_POLL_INTERVAL = 0.05
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """Priority class of the OpenAI calls made inside the block"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+def _text_tokens(value) -> int:
+    """Rough token count of a message content or embedding input (~4 characters per token)"""
+    if isinstance(value, str):
+        return len(value) // 4 + 1
+    if isinstance(value, list):
+        # Entrée d'embedding déjà tokenisée (liste d'IDs) ou liste de textes / de parts de message
+        if value and isinstance(value[0], int):
+            return len(value)
+        return sum(_text_tokens(item) for item in value)
+    if isinstance(value, dict):
+        return _text_tokens(value.get("text") or value.get("content") or "")
+    return 0
+
+
+def estimate_request_tokens(path: str, body: bytes) -> int:
+    """
+    Tokens an OpenAI request will count against the TPM limit
+    
+    Chat completions: prompt estimate + max_tokens (or LLM_COMPLETION_TOKENS_ESTIMATE);
+    embeddings: input estimate
+    """
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        return len(body or b"") // 4 + 1
+    
+    if path.endswith("/embeddings"):
+        return _text_tokens(payload.get("input", ""))
+    prompt = sum(_text_tokens(message.get("content", "")) for message in payload.get("messages", []))
+    completion = payload.get("max_tokens") or payload.get("max_completion_tokens") or Config.LLM_COMPLETION_TOKENS_ESTIMATE
+    return prompt + completion
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """Seconds requested by a 429 response (Retry-After / Retry-After-Ms), 1s by default"""
+    try:
+        if response.headers.get("retry-after-ms"):
+            return float(response.headers["retry-after-ms"]) / 1000
+        if response.headers.get("retry-after"):
+            return float(response.headers["retry-after"])
+    except ValueError:
+        pass
+    return 1.0
+
+
+class TokenBucket:
+    """Bucket of `capacity` units refilled continuously at `capacity` per minute"""
+    
+    def __init__(self, capacity: float):
+        self.capacity = max(1.0, float(capacity))
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self._updated = time.monotonic()
+    
+    def refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if available now)"""
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing / self.rate)
+    
+    def take(self, amount: float):
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimitScheduler:
+    """
+    Admits OpenAI requests through an RPM bucket and a TPM bucket.
+    
+    Waiting requests are served by priority class, then in arrival order: a request is only
+    admitted when it is at the head of the queue and both buckets can cover it.
+    A 429 response pauses every admission for the Retry-After delay.
+    Usable from threads (acquire) and from the event loop (aacquire).
+    """
+    
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.admitted = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self._waiters = []  # Tas de (priorité, numéro d'arrivée)
+        self._counter = itertools.count()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for admission"""
+        return len(self._waiters)
+    
+    def _enter(self, priority: int) -> tuple:
+        waiter = (priority, next(self._counter))
+        with self._lock:
+            heapq.heappush(self._waiters, waiter)
+        return waiter
+    
+    def _leave(self, waiter: tuple):
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+    
+    def _try_admit(self, waiter: tuple, tokens: int) -> float:
+        """Admit the waiter (returns 0) or return the delay before the next attempt"""
+        with self._lock:
+            if self._waiters[0] != waiter:
+                return _POLL_INTERVAL
+            now = time.monotonic()
+            if self._paused_until > now:
+                return self._paused_until - now
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if delay > 0:
+                return delay
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            heapq.heappop(self._waiters)
+            self.admitted += 1
+            return 0.0
+    
+    def acquire(self, tokens: int, priority: Optional[int] = None):
+        """Block the calling thread until the request is admitted"""
+        waiter = self._enter(current_priority() if priority is None else priority)
+        try:
+            delay = self._try_admit(waiter, tokens)
+            if delay > 0:
+                self.throttled += 1
+            while delay > 0:
+                time.sleep(min(delay, _POLL_INTERVAL))
+                delay = self._try_admit(waiter, tokens)
+        finally:
+            self._leave(waiter)
+    
+    async def aacquire(self, tokens: int, priority: Optional[int] = None):
+        """Wait (without blocking the event loop) until the request is admitted"""
+        waiter = self._enter(current_priority() if priority is None else priority)
+        try:
+            delay = self._try_admit(waiter, tokens)
+            if delay > 0:
+                self.throttled += 1
+            while delay > 0:
+                await asyncio.sleep(min(delay, _POLL_INTERVAL))
+                delay = self._try_admit(waiter, tokens)
+        finally:
+            self._leave(waiter)
+    
+    def pause(self, seconds: float):
+        """Suspend admissions after a rate limit response"""
+        with self._lock:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiters:
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                waiting[name] = waiting.get(name, 0) + 1
+        return {
+            "queue_depth": sum(waiting.values()),
+            "waiting": waiting,
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "rate_limited": self.rate_limited,
+            "rpm_limit": int(self.requests.capacity),
+            "tpm_limit": int(self.tokens.capacity)
+        }
+
+
+def _endpoint(request: httpx.Request) -> Optional[str]:
+    """OpenAI endpoint of a request ("chat", "embeddings"), None for other requests"""
+    if request.method != "POST":
+        return None
+    path = request.url.path
+    if path.endswith("/chat/completions"):
+        return "chat"
+    if path.endswith("/embeddings"):
+        return "embeddings"
+    return None
+
+
+def _request_tokens(request: httpx.Request) -> int:
+    try:
+        body = request.content
+    except httpx.RequestNotRead:
+        body = b""
+    return estimate_request_tokens(request.url.path, body)
+
+
+def _record_response(scheduler: Optional[RateLimitScheduler], endpoint: str, started: float, response: httpx.Response):
+    OPENAI_REQUEST_DURATION.observe(time.perf_counter() - started, endpoint=endpoint)
+    OPENAI_RESPONSES.inc(endpoint=endpoint, status=response.status_code)
+    if response.status_code == 429 and scheduler is not None:
+        scheduler.pause(_retry_after(response))
+
+
+class SchedulingTransport(httpx.BaseTransport):
+    """Sync transport admitting OpenAI requests through the scheduler (if any) and timing them"""
+    
+    def __init__(self, transport: httpx.BaseTransport, scheduler: Optional[RateLimitScheduler]):
+        self._transport = transport
+        self._scheduler = scheduler
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = _endpoint(request)
+        if endpoint is None:
+            return self._transport.handle_request(request)
+        tokens = _request_tokens(request)
+        OPENAI_ESTIMATED_TOKENS.inc(tokens, endpoint=endpoint)
+        if self._scheduler is not None:
+            self._scheduler.acquire(tokens)
+        started = time.perf_counter()
+        response = self._transport.handle_request(request)
+        _record_response(self._scheduler, endpoint, started, response)
+        return response
+    
+    def close(self):
+        self._transport.close()
+
+
+class AsyncSchedulingTransport(httpx.AsyncBaseTransport):
+    """Async transport admitting OpenAI requests through the scheduler (if any) and timing them"""
+    
+    def __init__(self, transport: httpx.AsyncBaseTransport, scheduler: Optional[RateLimitScheduler]):
+        self._transport = transport
+        self._scheduler = scheduler
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = _endpoint(request)
+        if endpoint is None:
+            return await self._transport.handle_async_request(request)
+        tokens = _request_tokens(request)
+        OPENAI_ESTIMATED_TOKENS.inc(tokens, endpoint=endpoint)
+        if self._scheduler is not None:
+            await self._scheduler.aacquire(tokens)
+        started = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        _record_response(self._scheduler, endpoint, started, response)
+        return response
+    
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+# Scheduler partagé par tous les clients HTTP (créé au premier usage)
+_scheduler = None
+
+
+def get_scheduler() -> RateLimitScheduler:
+    """Shared scheduler (OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT)"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RateLimitScheduler(Config.OPENAI_RPM_LIMIT, Config.OPENAI_TPM_LIMIT)
+    return _scheduler
@@ -0,0 +1,103 @@
+"""Disk-backed result cache (SQLite, JSON values) with TTL and index version invalidation"""
+from typing import Any, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.config import Config
+from app.utils.metrics import register_cache
+
+
+def cache_key(*parts: Optional[str]) -> str:
+    """Stable key from normalized parts (case and whitespace insensitive)"""
+    normalized = [" ".join((part or "").lower().split()) for part in parts]
+    return hashlib.sha256(json.dumps(normalized).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    JSON values stored in a SQLite table, keyed by a string key.
+    An entry is only served if it is younger than `ttl` seconds and was stored
+    for the current index version.
+    """
+    
+    def __init__(self, path: str, table: str, ttl: float):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, index_version TEXT, created_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+    
+    def get(self, key: str, index_version: Optional[str]) -> Optional[Any]:
+        """
+        Get a cached value
+        
+        Args:
+            key: Cache key
+            index_version: Current index version (entries from another version are stale)
+        
+        Returns:
+            The cached value, or None if missing, expired or stale
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT index_version, created_at, value FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[0] != index_version or row[1] + self.ttl < time.time():
+                if row is not None:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[2])
+    
+    def set(self, key: str, index_version: Optional[str], value: Any):
+        """
+        Store a JSON-serializable value
+        
+        Args:
+            key: Cache key
+            index_version: Index version the value was computed with
+            value: Value to cache
+        """
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, index_version, created_at, value) VALUES (?, ?, ?, ?)",
+                (key, index_version, time.time(), json.dumps(value))
+            )
+            self._conn.commit()
+
+
+# Caches partagés (créés au premier usage)
+_report_cache = None
+_section_cache = None
+
+
+def get_report_cache() -> ResultCache:
+    """Cache of complete reports (sections + expert recommendations)"""
+    global _report_cache
+    if _report_cache is None:
+        _report_cache = ResultCache(Config.RESULT_CACHE_PATH, "reports", Config.REPORT_CACHE_TTL)
+        register_cache("reports", _report_cache)
+    return _report_cache
+
+
+def get_section_cache() -> ResultCache:
+    """Cache of generated sections, shared across reports"""
+    global _section_cache
+    if _section_cache is None:
+        _section_cache = ResultCache(Config.RESULT_CACHE_PATH, "sections", Config.SECTION_CACHE_TTL)
+        register_cache("sections", _section_cache)
+    return _section_cache
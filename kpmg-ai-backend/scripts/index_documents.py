@@ -10,6 +10,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.tools.rag_tool import _get_vectorstore
+from app.utils.embeddings import get_embeddings
 
 if __name__ == "__main__":
     print("🚀 Starting document indexing...")
@@ -18,6 +19,10 @@ if __name__ == "__main__":
     # Force reindex
     vectorstore = _get_vectorstore(force_reindex=True)
     
+    cache_stats = get_embeddings().stats()
+    print()
+    print(f"💾 Embedding cache: {cache_stats['hits']} hit(s), {cache_stats['misses']} miss(es)")
+    
     if vectorstore:
         print()
         print("✅ Documents successfully indexed!")
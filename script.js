@@ -1413,6 +1413,40 @@ async function generateReportWithN8n(website, market, geo, mission) {
 
 let progressIndicatorElement = null;
 let currentReportSections = [];
+let streamedSectionContent = {}; // ID de section → texte reçu via 'section_delta'
+let streamedSectionMessages = {}; // ID de section → message affiché pendant le streaming
+let pendingSectionRenders = new Set();
+let sectionRenderScheduled = false;
+
+// Afficher les sections au fil des 'section_delta' (rendu regroupé par frame, pas à chaque token)
+function renderStreamedSection(sectionId) {
+    pendingSectionRenders.add(sectionId);
+    if (sectionRenderScheduled) {
+        return;
+    }
+    sectionRenderScheduled = true;
+    requestAnimationFrame(() => {
+        sectionRenderScheduled = false;
+        pendingSectionRenders.forEach(id => {
+            const text = streamedSectionContent[id] || '';
+            const message = streamedSectionMessages[id];
+            if (message) {
+                message.querySelector('.message-content').innerHTML = formatText(text);
+            } else {
+                streamedSectionMessages[id] = addMessage(text, 'bot');
+            }
+        });
+        pendingSectionRenders.clear();
+        scrollToBottom();
+    });
+}
+
+// Retirer l'aperçu streamé : le rapport final est réaffiché dans l'ordre du plan avec son sommaire
+function clearStreamedSections() {
+    Object.values(streamedSectionMessages).forEach(message => message.remove());
+    streamedSectionMessages = {};
+    pendingSectionRenders.clear();
+}
 
 function showProgressIndicator() {
     // Remove existing progress indicator if any
@@ -1541,6 +1575,8 @@ function removeProgressIndicator() {
 async function connectToSSE(website, market, geo, mission) {
     showProgressIndicator();
     currentReportSections = [];
+    streamedSectionContent = {};
+    clearStreamedSections();
     
     const url = `${LANGCHAIN_API_URL}/api/generate-report-stream`;
     const timeout = 5 * 60 * 1000; // 5 minutes
@@ -1623,6 +1659,13 @@ async function handleSSEEvent(event) {
             updateProgress(0, 'Initialisation...', {});
             break;
             
+        case 'queued':
+            // Le rapport attend un worker libre côté serveur
+            if (event.position > 0) {
+                updateProgress(0, `En file d'attente (${event.position} rapport(s) avant le vôtre)...`, {});
+            }
+            break;
+            
         case 'progress':
             const percentage = (event.percentage || 0) * 100;
             updateProgress(percentage, event.step || 'En cours...', event.details || {});
@@ -1642,8 +1685,27 @@ async function handleSSEEvent(event) {
             }
             break;
             
+        case 'section_delta':
+            if (event.section_id) {
+                // Contenu streamé token par token, renvoyé sans 'content' dans l'événement 'complete'
+                streamedSectionContent[event.section_id] = (streamedSectionContent[event.section_id] || '') + (event.delta || '');
+                renderStreamedSection(event.section_id);
+            }
+            break;
+            
+        case 'expert_recommendation':
+            if (event.recommendation) {
+                // Les recommandations sont affichées avec le rapport (événement 'complete')
+                console.log('Recommandation expert prête:', event.recommendation.section_title);
+                updateProgress(100, 'expert_recommendation', {
+                    message: `Recommandation expert prête : ${event.recommendation.section_title}`
+                });
+            }
+            break;
+            
         case 'complete':
             removeProgressIndicator();
+            clearStreamedSections();
             console.log('✅ Analyse terminée');
             
             // Créer le sommaire et afficher les sections
@@ -1693,6 +1755,8 @@ async function handleSSEEvent(event) {
                             sectionContent = section;
                         } else if (section.content) {
                             sectionContent = section.content;
+                        } else if (section.content_streamed && streamedSectionContent[section.id]) {
+                            sectionContent = streamedSectionContent[section.id];
                         } else {
                             sectionContent = `## ${section.title || section.id || 'Section'}\n\n${JSON.stringify(section, null, 2)}`;
                         }